@@ -1,16 +1,20 @@
 #!/usr/bin/env python3
+import re
 import sys
-import traceback
+import argparse
+from dataclasses import dataclass
 from pathlib import Path
 
 try:
     # Import necessary functions from huggingface_hub
-    from huggingface_hub import hf_hub_download, snapshot_download, model_info
+    from huggingface_hub import hf_hub_download, snapshot_download
     from huggingface_hub.utils import HfHubHTTPError, HFValidationError
+    from hugger_core import (HF_TRANSFER_AVAILABLE, PARALLEL_DOWNLOAD_CONNECTIONS, set_hf_transfer, set_xet_high_performance,
+                             cached_model_info, make_http_client, parallel_single_download, _parallel_download_plan)
 except ImportError:
     print(
         "Error: huggingface_hub library not found.\n"
-        "Please install it using: pip install huggingface_hub",
+        "Please install it using: pip install huggingface_hub[hf_xet]",
         file=sys.stderr
     )
     sys.exit(1)
@@ -79,10 +83,13 @@ console = Console()
 # --- Default Settings ---
 DEFAULT_SAVE_DIR = Path.home() / "hf_models"
 DEFAULT_WORKERS = 3
+WORKER_CHOICES = [1, 2, 3, 4, 6, 8]
 # Define default models/files for prompts
 DEFAULT_SINGLE_FILE_REPO = "google-bert/bert-base-uncased"
 DEFAULT_SINGLE_FILENAME = "config.json"
 DEFAULT_MODEL_REPO = "distilbert-base-uncased"
+# Classifies "missing repo/file" errors
+_NOT_FOUND_RE = re.compile(r"404|not[ _]found|repository not found", re.I)
 
 
 # --- Helper Functions ---
@@ -98,29 +105,40 @@ def display_main_menu():
         padding=(1, 2)
     ))
 
+def _on_http_error(e, repo_id, filename):
+    if _NOT_FOUND_RE.search(str(e)):
+        target = f"File '{filename}' in repo" if filename else "Repository"
+        console.print(f"[bold red]Error:[/] {target} '{repo_id}' not found (404). Please check the names.")
+    else:
+        console.print(f"[bold red]Error:[/] Network or server error downloading from '{repo_id}'.")
+        console.print(f"[dim]{e}[/dim]")
+
+def _on_validation_error(e, repo_id, filename):
+    console.print(f"[bold red]Error:[/] Invalid repository or file name: '{repo_id}'{f'/{filename}' if filename else ''}.")
+    console.print(f"[dim]{e}[/dim]")
+
+def _on_dir_error(e, repo_id, filename):
+    console.print(f"[bold red]Error:[/] Could not create local directory. Check permissions.")
+    console.print(f"[dim]{e}[/dim]")
+
+_ERR_HANDLERS = {HfHubHTTPError: _on_http_error, HFValidationError: _on_validation_error, FileNotFoundError: _on_dir_error}
+
 def handle_download_error(e, repo_id, filename=None):
     """Handles common download errors and prints styled messages."""
-    if isinstance(e, HfHubHTTPError):
-        if "404" in str(e) or "not found" in str(e).lower() or "repository not found" in str(e).lower():
-            target = f"File '{filename}' in repo" if filename else "Repository"
-            console.print(f"[bold red]Error:[/] {target} '{repo_id}' not found (404). Please check the names.")
-        else:
-            console.print(f"[bold red]Error:[/] Network or server error downloading from '{repo_id}'.")
-            console.print(f"[dim]{e}[/dim]")
-    elif isinstance(e, HFValidationError):
-         console.print(f"[bold red]Error:[/] Invalid repository or file name: '{repo_id}'{f'/{filename}' if filename else ''}.")
-         console.print(f"[dim]{e}[/dim]")
-    elif isinstance(e, FileNotFoundError):
-         console.print(f"[bold red]Error:[/] Could not create local directory. Check permissions.")
-         console.print(f"[dim]{e}[/dim]")
-    else:
-        console.print(f"[bold red]An unexpected error occurred:[/]")
-        # Print traceback for unexpected errors only if they are not HfHubHTTPError or HFValidationError
-        # as those are handled more gracefully above.
-        if not isinstance(e, (HfHubHTTPError, HFValidationError)):
-             console.print(f"[dim]{traceback.format_exc()}[/dim]")
-        else:
-             console.print(f"[dim]{e}[/dim]") # Print the error string for handled types
+    # Walking the MRO lets subclasses (e.g. RepositoryNotFoundError) reach their base class handler
+    for cls in type(e).__mro__:
+        if cls in _ERR_HANDLERS:
+            return _ERR_HANDLERS[cls](e, repo_id, filename)
+    # Print the traceback for unexpected errors only; the types above are reported gracefully
+    import traceback # Only needed on this cold path
+    console.print(f"[bold red]An unexpected error occurred:[/]")
+    console.print(f"[dim]{traceback.format_exc()}[/dim]")
+
+def ask_hf_transfer():
+    """Asks whether to use hf_transfer, skipping the prompt when it is not installed."""
+    if not HF_TRANSFER_AVAILABLE:
+        return set_hf_transfer(False)
+    return set_hf_transfer(Confirm.ask("[cyan]Use hf_transfer (Rust) backend?[/cyan]", default=True))
 
 def validate_path(path_str):
     """Validates and resolves a directory path to prevent path traversal and ensure it's absolute."""
@@ -140,128 +158,207 @@ def ensure_directory(path: Path):
         console.print(f"[dim]{e}[/dim]")
         return False
 
-def run_single_download():
-    """Prompts for single file info and initiates download."""
-    # Applying user's color preference for the rule
-    console.rule("[#ADFF2F]Download Single File[/#ADFF2F]")
-    repo_id = Prompt.ask("[cyan]Enter Repository ID[/cyan]", default=DEFAULT_SINGLE_FILE_REPO)
-    if not repo_id: console.print("[yellow]Repo ID cannot be empty. Aborting.[/yellow]"); return
-
-    filename = Prompt.ask("[cyan]Enter Filename[/cyan]", default=DEFAULT_SINGLE_FILENAME)
-    if not filename: console.print("[yellow]Filename cannot be empty. Aborting.[/yellow]"); return
-
-    local_dir_str = Prompt.ask(f"[cyan]Enter Save Directory[/cyan]", default=str(DEFAULT_SAVE_DIR))
-    try:
-        local_dir = validate_path(local_dir_str)
-    except ValueError as e:
-        console.print(f"[bold red]Error:[/] Invalid directory path: {e}")
-        return
-
-    if not ensure_directory(local_dir): return
-
+@dataclass
+class DownloadSpec:
+    """Everything a download needs, gathered either from prompts or from command-line flags."""
+    repo_id: str
+    local_dir: Path
+    filename: str = None # None downloads the entire model
+    workers: int = DEFAULT_WORKERS
+    use_hf_transfer: bool = True
+    fetch_info: bool = False
+
+def download_file(spec, client=None):
+    """Downloads spec.filename from spec.repo_id, reusing client for ranged requests. Returns True on success."""
+    use_hf_transfer = set_hf_transfer(spec.use_hf_transfer)
     console.print(f"\n[magenta]Starting download...[/magenta]")
     # Applying user's color preference for info lines
-    console.print(f"  Repo ID: [#ADFF2F]{repo_id}[/#ADFF2F]")
-    console.print(f"  Filename: [#ADFF2F]{filename}[/#ADFF2F]")
-    console.print(f"  Save Dir: [#ADFF2F]{local_dir}[/#ADFF2F]")
+    console.print(f"  Repo ID: [#ADFF2F]{spec.repo_id}[/#ADFF2F]")
+    console.print(f"  Filename: [#ADFF2F]{spec.filename}[/#ADFF2F]")
+    console.print(f"  Save Dir: [#ADFF2F]{spec.local_dir}[/#ADFF2F]")
+    console.print(f"  Backend: [#ADFF2F]{'hf_transfer (Rust)' if use_hf_transfer else 'default'}[/#ADFF2F]")
     console.rule()
 
     try:
-        file_path = hf_hub_download(
-            repo_id=repo_id,
-            filename=filename,
-            local_dir=local_dir,
-            cache_dir=local_dir / ".cache"
-        )
+        plan = _parallel_download_plan(spec.repo_id, spec.filename)
+        if plan:
+            url, size, sha256, headers = plan
+            dest = spec.local_dir / spec.filename
+            if not ensure_directory(dest.parent): return False
+            with console.status(f"[cyan]Downloading {size / 2**20:.0f} MiB over {PARALLEL_DOWNLOAD_CONNECTIONS} connections...[/]"):
+                file_path = parallel_single_download(url, dest, size, headers=headers, expected_sha256=sha256, client=client, resume=True)
+        else:
+            file_path = hf_hub_download(
+                repo_id=spec.repo_id,
+                filename=spec.filename,
+                local_dir=spec.local_dir,
+                cache_dir=spec.local_dir / ".cache"
+            )
         console.rule()
         # Applying user's color preference for success message
         console.print(f"[#ADFF2F]Success![/#ADFF2F] File downloaded to:")
         # Applying user's color preference for path and FIXING the closing tag
         console.print(f"  [bold #F59E0B]{file_path}[/]")
+        return True
 
     except Exception as e:
         console.rule()
-        handle_download_error(e, repo_id, filename)
-
-def run_model_download():
-    """Prompts for model info and initiates download."""
-    console.rule("[bold blue]Download Entire Model[/]")
-    repo_id = Prompt.ask("[cyan]Enter Repository ID[/cyan]", default=DEFAULT_MODEL_REPO)
-    if not repo_id: console.print("[yellow]Repo ID cannot be empty. Aborting.[/yellow]"); return
-
-    local_dir_base_str = Prompt.ask(f"[cyan]Enter Base Save Directory[/cyan]", default=str(DEFAULT_SAVE_DIR))
-    try:
-        local_dir_base = validate_path(local_dir_base_str)
-    except ValueError as e:
-        console.print(f"[bold red]Error:[/] Invalid directory path: {e}")
-        return
-
-    workers = IntPrompt.ask(f"[cyan]Enter Number of Workers[/cyan]", default=DEFAULT_WORKERS, choices=[str(w) for w in [1, 2, 3, 4, 6, 8]])
+        handle_download_error(e, spec.repo_id, spec.filename)
+        return False
 
-    if not ensure_directory(local_dir_base): return
+def download_model(spec):
+    """Downloads the entire spec.repo_id repository under spec.local_dir. Returns True on success."""
+    use_hf_transfer = set_hf_transfer(spec.use_hf_transfer)
+    use_xet = set_xet_high_performance(True)
 
     # --- Get File Count ---
     num_files_str = ""
-    fetch_info = Confirm.ask(f"[cyan]Fetch file count before downloading? (may take a moment)[/cyan]", default=False)
-    if fetch_info:
+    if spec.fetch_info:
         try:
-            with console.status(f"[cyan]Fetching model info for {repo_id}...[/]"):
-                 info = model_info(repo_id=repo_id)
-            num_files = len(info.siblings)
+            with console.status(f"[cyan]Fetching model info for {spec.repo_id}...[/]"):
+                 info = cached_model_info(spec.repo_id)
+            num_files = len(info["siblings"])
+            total_mb = sum(s["size"] or 0 for s in info["siblings"]) / 2**20
             num_files_str = f" ({num_files} files expected)"
-            console.print(f"  Model Info: [green]Found {num_files} files.[/green]")
+            console.print(f"  Model Info: [green]Found {num_files} files ({total_mb:,.1f} MiB).[/green]")
         except Exception as info_err:
              console.print(f"  Model Info: [yellow]Warning: Could not get file count: {info_err}[/yellow]")
     # ---
 
     console.print(f"\n[magenta]Starting download...[/magenta]")
-    console.print(f"  Repo ID: [bold]{repo_id}[/bold]") # Keeping original bold for contrast
-    console.print(f"  Save Dir Base: [bright_green]{local_dir_base}[/bright_green]")
-    console.print(f"  Workers: [bright_green]{workers}[/bright_green]")
+    console.print(f"  Repo ID: [bold]{spec.repo_id}[/bold]") # Keeping original bold for contrast
+    console.print(f"  Save Dir Base: [bright_green]{spec.local_dir}[/bright_green]")
+    console.print(f"  Workers: [bright_green]{spec.workers}[/bright_green]")
+    console.print(f"  Backend: [bright_green]{'hf_transfer (Rust)' if use_hf_transfer else 'default'}[/bright_green]")
+    console.print(f"  Xet High Performance: [bright_green]{'on' if use_xet else 'off (pip install hf_xet)'}[/bright_green]")
     console.rule(f"Starting Download{num_files_str}")
 
-    model_target_dir = local_dir_base / repo_id
+    model_target_dir = spec.local_dir / spec.repo_id
 
     try:
         model_path = snapshot_download(
-            repo_id=repo_id,
+            repo_id=spec.repo_id,
             local_dir=model_target_dir,
-            max_workers=workers
+            max_workers=spec.workers
         )
         console.rule()
         console.print(f"[green]Success![/green] Model downloaded to directory:")
         # Keeping original bold cyan for contrast
         console.print(f"  [bold cyan]{model_path}[/]")
+        return True
 
     except Exception as e:
         console.rule()
-        handle_download_error(e, repo_id)
+        handle_download_error(e, spec.repo_id)
+        return False
+
+def run_single_download(client=None):
+    """Prompts for single file info and initiates download, reusing client for ranged requests."""
+    # Applying user's color preference for the rule
+    console.rule("[#ADFF2F]Download Single File[/#ADFF2F]")
+    repo_id = Prompt.ask("[cyan]Enter Repository ID[/cyan]", default=DEFAULT_SINGLE_FILE_REPO)
+    if not repo_id: console.print("[yellow]Repo ID cannot be empty. Aborting.[/yellow]"); return
+
+    filename = Prompt.ask("[cyan]Enter Filename[/cyan]", default=DEFAULT_SINGLE_FILENAME)
+    if not filename: console.print("[yellow]Filename cannot be empty. Aborting.[/yellow]"); return
+
+    local_dir_str = Prompt.ask(f"[cyan]Enter Save Directory[/cyan]", default=str(DEFAULT_SAVE_DIR))
+    try:
+        local_dir = validate_path(local_dir_str)
+    except ValueError as e:
+        console.print(f"[bold red]Error:[/] Invalid directory path: {e}")
+        return
+
+    if not ensure_directory(local_dir): return
+
+    download_file(DownloadSpec(repo_id, local_dir, filename, use_hf_transfer=ask_hf_transfer()), client)
+
+def run_model_download():
+    """Prompts for model info and initiates download."""
+    console.rule("[bold blue]Download Entire Model[/]")
+    repo_id = Prompt.ask("[cyan]Enter Repository ID[/cyan]", default=DEFAULT_MODEL_REPO)
+    if not repo_id: console.print("[yellow]Repo ID cannot be empty. Aborting.[/yellow]"); return
+
+    local_dir_base_str = Prompt.ask(f"[cyan]Enter Base Save Directory[/cyan]", default=str(DEFAULT_SAVE_DIR))
+    try:
+        local_dir_base = validate_path(local_dir_base_str)
+    except ValueError as e:
+        console.print(f"[bold red]Error:[/] Invalid directory path: {e}")
+        return
+
+    workers = IntPrompt.ask(f"[cyan]Enter Number of Workers[/cyan]", default=DEFAULT_WORKERS, choices=[str(w) for w in WORKER_CHOICES])
+
+    if not ensure_directory(local_dir_base): return
+
+    use_hf_transfer = ask_hf_transfer()
+    fetch_info = Confirm.ask(f"[cyan]Fetch file count before downloading? (may take a moment)[/cyan]", default=False)
+    download_model(DownloadSpec(repo_id, local_dir_base, workers=workers, use_hf_transfer=use_hf_transfer, fetch_info=fetch_info))
+
+def parse_args(argv):
+    """Parses scripted-use arguments (`file REPO FILENAME` or `model REPO`) into a DownloadSpec."""
+    parser = argparse.ArgumentParser(description="Download files or entire models from the Hugging Face Hub. Run without arguments for the interactive menu.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    file_cmd = commands.add_parser("file", help="Download a single file")
+    file_cmd.add_argument("repo_id")
+    file_cmd.add_argument("filename")
+    model_cmd = commands.add_parser("model", help="Download an entire model")
+    model_cmd.add_argument("repo_id")
+    model_cmd.add_argument("-w", "--workers", type=int, choices=WORKER_CHOICES, default=DEFAULT_WORKERS, help="Parallel downloads (default: %(default)s)")
+    model_cmd.add_argument("--info", action="store_true", help="Fetch the file count before downloading")
+    for cmd in (file_cmd, model_cmd):
+        cmd.add_argument("-d", "--dir", default=str(DEFAULT_SAVE_DIR), help="Save directory (default: %(default)s)")
+        cmd.add_argument("--no-hf-transfer", action="store_true", help="Use the default backend even if hf_transfer is installed")
+    args = parser.parse_args(argv)
+    try:
+        local_dir = validate_path(args.dir)
+    except ValueError as e:
+        parser.error(f"Invalid directory path: {e}")
+    return DownloadSpec(args.repo_id, local_dir, getattr(args, "filename", None), getattr(args, "workers", DEFAULT_WORKERS), not args.no_hf_transfer, getattr(args, "info", False))
+
+def run_cli(argv):
+    """Runs one download described by argv without prompting. Returns the process exit code."""
+    spec = parse_args(argv)
+    if not ensure_directory(spec.local_dir): return 1
+    if spec.filename is None: return 0 if download_model(spec) else 1
+    client = make_http_client()
+    try:
+        return 0 if download_file(spec, client) else 1
+    finally:
+        if client is not None:
+            client.close()
 
 
 # --- Main Application Loop ---
 def run_app():
     """Runs the main interactive menu loop."""
-    while True:
-        display_main_menu()
-        choice = Prompt.ask("[bold #F59E0B]Choose an option[/]", choices=["1", "2", "3"])
-
-        if choice == '1':
-            run_single_download()
-        elif choice == '2':
-            run_model_download()
-        elif choice == '3':
-            console.print("[bold blue]Exiting program.[/]")
-            break
-        else:
-            console.print("[red]Invalid choice, please try again.[/red]")
-
-        console.print("\nPress Enter to continue...")
-        input()
-        console.print("\n" * 2)
+    # One pooled client per run, so repeated downloads reuse warm connections
+    client = make_http_client()
+    try:
+        while True:
+            display_main_menu()
+            choice = Prompt.ask("[bold #F59E0B]Choose an option[/]", choices=["1", "2", "3"])
+
+            if choice == '1':
+                run_single_download(client)
+            elif choice == '2':
+                run_model_download()
+            elif choice == '3':
+                console.print("[bold blue]Exiting program.[/]")
+                break
+            else:
+                console.print("[red]Invalid choice, please try again.[/red]")
+
+            console.print("\nPress Enter to continue...")
+            input()
+            console.print("\n" * 2)
+    finally:
+        if client is not None:
+            client.close()
 
 
 if __name__ == "__main__":
     try:
+        if len(sys.argv) > 1: sys.exit(run_cli(sys.argv[1:]))
         run_app()
     except KeyboardInterrupt:
         console.print("\n[yellow]Operation interrupted by user. Exiting.[/yellow]")
@@ -6,10 +6,15 @@ import os
 import threading
 import queue
 import sys
-import traceback
 import re
-import subprocess
+import shutil
 import pathlib
+from enum import IntEnum
+from collections import deque
+import time
+import shelve
+import asyncio
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 
 # --- Color Scheme (Dark theme inspired by Hugging Face) ---
 BG_COLOR = '#2D3748'  # Dark Gray-Blue (Window, Frames)
@@ -30,15 +35,33 @@ LOG_TEXT_FG = '#F59E0B' # Amber/Gold color for Log Text
 SELECT_BG = '#4299E1' # Blue for selected text background
 SELECT_FG = '#FFFFFF' # White for selected text foreground
 
+XET_SPEED_OPTION = "Ultra+ (Xet, 8 workers)" # Speed option that also enables HF_XET_HIGH_PERFORMANCE
+_NOT_FOUND_RE = re.compile(r"404|not[ _]found|repository not found", re.I) # Classifies "missing repo/file" errors
+_WORKER_RE = re.compile(r"(\d+)") # Worker count in a speed option label
+LOG_MAX_LINES = 2000 # Status log lines kept; older ones are trimmed
+_LOG_BREAK_PREFIXES = ("ERROR:", "SUCCESS:", "---") # Log records that get a blank line before them
+
+def _log_line_count(message):
+    """Returns how many lines message takes up in the status log, including its separator."""
+    return message.count("\n") + 1 + message.startswith(_LOG_BREAK_PREFIXES)
+
+ETAG_TIMEOUT = 30 # Seconds to wait for file metadata before hf_hub_download gives up
+CANCEL_CHECK_INTERVAL = 0.25 # Longest a waiting download loop goes without checking for a cancel
+EXIT_GRACE_PERIOD = 5 # Seconds a closed window waits for the running download to clean up before exiting
+
 
 # Simple import with minimal dependencies
 try:
-    from huggingface_hub import hf_hub_download, snapshot_download
+    from huggingface_hub import hf_hub_download, snapshot_download, hf_hub_url
+    from huggingface_hub.utils import build_hf_headers
+    from hugger_core import (HF_TRANSFER_AVAILABLE, HF_XET_AVAILABLE, PARALLEL_DOWNLOAD_CONNECTIONS, DOWNLOAD_CHUNK_SIZE,
+                             set_hf_transfer, hf_transfer_enabled, set_xet_high_performance, cached_model_info, make_http_client, preallocate,
+                             fast_sha256, _git_blob_sha1, parallel_single_download, _parallel_download_plan)
     print("Successfully imported core huggingface_hub functions")
 except ImportError as e:
     print(f"Import Error: {e}")
     root_check = tk.Tk(); root_check.withdraw()
-    messagebox.showerror("Error", f"Could not import from huggingface_hub: {e}\n\nPlease install with:\npip install huggingface_hub")
+    messagebox.showerror("Error", f"Could not import from huggingface_hub: {e}\n\nPlease install with:\npip install huggingface_hub[hf_xet]")
     root_check.destroy(); sys.exit(1)
 except Exception as e:
     print(f"Unexpected Import Error: {e}")
@@ -46,43 +69,239 @@ except Exception as e:
     messagebox.showerror("Error", f"An unexpected error occurred during import:\n{e}")
     root_check.destroy(); sys.exit(1)
 
+if not HF_XET_AVAILABLE: print("hf_xet not found; 'Ultra+ (Xet)' speed is unavailable. Install with: pip install huggingface_hub[hf_xet]")
+
+# Optional async engine for entire-model downloads; snapshot_download is used without it
+try:
+    import aiohttp
+    import aiofiles
+    ASYNC_ENGINE_AVAILABLE = True
+except ImportError:
+    ASYNC_ENGINE_AVAILABLE = False
+
+HTTP_CLIENT = make_http_client() # Reused by every range request so TLS connections stay warm
+
+# --- Directory Creation ---
+_MKDIR_CACHE = set() # Directories already created during the current download
+_MKDIR_LOCK = threading.Lock()
+
+def ensure_dir_once(path):
+    """Creates path (and parents) unless this download already did, sparing a stat+mkdir per file in the same folder."""
+    with _MKDIR_LOCK:
+        if path in _MKDIR_CACHE: return
+        os.makedirs(path, exist_ok=True); _MKDIR_CACHE.add(path)
+
+def reset_dir_cache():
+    """Forgets created directories, so a folder removed between downloads is recreated."""
+    with _MKDIR_LOCK: _MKDIR_CACHE.clear()
+
+def needs_download(local_path, meta, verified=None):
+    """Returns False if local_path already holds the file described by meta ({"size", "sha256", "blob_id"}).
+
+    verified is an optional mapping of files hashed earlier ({key: [size, mtime_ns]}); unchanged files are not rehashed.
+    """
+    try: st = os.stat(local_path)
+    except OSError: return True
+    if meta.get("size") is not None and st.st_size != meta["size"]: return True
+    etag = meta.get("sha256") or meta.get("blob_id")
+    if not etag: return meta.get("size") is None # Nothing to compare beyond the size
+    key = f"{etag} {os.path.abspath(local_path)}"
+    if verified is not None and verified.get(key) == [st.st_size, st.st_mtime_ns]: return False
+    if (fast_sha256(local_path) if meta.get("sha256") else _git_blob_sha1(local_path)) != etag: return True
+    if verified is not None: verified[key] = [st.st_size, st.st_mtime_ns]
+    return False
+
+# --- Async Snapshot Download ---
+async def _download_one_async(session, semaphore, url, dest, cancel_event, size=None, resume=False, progress=None):
+    """Streams url into dest (via a preallocated .incomplete file when size is known) while holding a semaphore slot.
+
+    With resume, a partial .incomplete file left by a cancelled run is continued with a Range request.
+    progress is an optional one-item list that is incremented by every byte of dest received, including resumed bytes.
+    """
+    async with semaphore:
+        if cancel_event.is_set(): raise InterruptedError("Download cancelled during operation")
+        ensure_dir_once(os.path.dirname(dest)); tmp_path = dest + ".incomplete"
+        written = os.path.getsize(tmp_path) if resume and size and os.path.exists(tmp_path) else 0
+        if written >= (size or 0): written = 0 # A full-size leftover is a preallocated file from a crashed run
+        try:
+            if size:
+                fd = os.open(tmp_path, os.O_RDWR | os.O_CREAT | (0 if written else os.O_TRUNC) | getattr(os, "O_BINARY", 0), 0o644)
+                try: preallocate(fd, size)
+                finally: os.close(fd)
+            async with session.get(url, headers={"Range": f"bytes={written}-"} if written else None) as response:
+                response.raise_for_status()
+                if response.status != 206: written = 0 # Range ignored, start over
+                if progress is not None: progress[0] += written # Bytes kept from a resumed run count as done
+                # r+b keeps the preallocated extent instead of truncating it
+                async with aiofiles.open(tmp_path, "r+b" if size else "wb") as f:
+                    await f.seek(written)
+                    async for chunk in response.content.iter_chunked(DOWNLOAD_CHUNK_SIZE):
+                        if cancel_event.is_set(): raise InterruptedError("Download cancelled during operation")
+                        await f.write(chunk); written += len(chunk)
+                        if progress is not None: progress[0] += len(chunk)
+            if size and written != size: raise IOError(f"Size mismatch for {os.path.basename(dest)}: expected {size} bytes, got {written}")
+        except BaseException:
+            try:
+                # Keep exactly the bytes received so the next resumed run continues from there
+                if resume and size and written and written < size: os.truncate(tmp_path, written)
+                else: os.remove(tmp_path)
+            except OSError: pass
+            raise
+        os.replace(tmp_path, dest)
+
+async def _snapshot_async(repo_id, target, concurrency, files, revision, status_queue, cancel_event, resume=False, progress=None):
+    """Downloads files ({filename: size or None}) of repo_id at revision into target over a single shared aiohttp session."""
+    connector = aiohttp.TCPConnector(limit=concurrency, limit_per_host=concurrency)
+    semaphore = asyncio.Semaphore(concurrency)
+    # aiohttp drops the Authorization header when redirected to the CDN
+    async with aiohttp.ClientSession(connector=connector, headers=build_hf_headers(), timeout=aiohttp.ClientTimeout(total=None, sock_read=60)) as session:
+        async def fetch(filename, size):
+            await _download_one_async(session, semaphore, hf_hub_url(repo_id=repo_id, filename=filename, revision=revision), os.path.join(target, filename), cancel_event, size, resume, progress)
+            status_queue.put((MsgKind.LOG, f"Downloaded {filename}"))
+        tasks = [asyncio.create_task(fetch(filename, size)) for filename, size in files.items()]
+        try: await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks: task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True); raise
+    return target
+
+_ASYNC_LOOP = None
+_ASYNC_LOOP_LOCK = threading.Lock()
+
+def run_async(coro):
+    """Runs coro on the shared event loop thread (started on first use) and blocks until it finishes."""
+    global _ASYNC_LOOP
+    with _ASYNC_LOOP_LOCK:
+        if _ASYNC_LOOP is None:
+            # One long-lived loop instead of asyncio.run per download, which builds and tears down a loop every time
+            _ASYNC_LOOP = asyncio.new_event_loop()
+            threading.Thread(target=_ASYNC_LOOP.run_forever, name="asyncio-loop", daemon=True).start()
+    return asyncio.run_coroutine_threadsafe(coro, _ASYNC_LOOP).result()
+
+def _dir_bytes(path):
+    """Returns the total size of the files under path, using scandir (whose stat results are free on Windows).
+
+    .incomplete files are left out: they may be preallocated to their final size before any data arrives.
+    """
+    total = 0
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False): total += _dir_bytes(entry.path)
+                elif entry.is_file(follow_symlinks=False) and not entry.name.endswith(".incomplete"): total += entry.stat(follow_symlinks=False).st_size
+    except OSError: pass # Temp files appear and vanish while downloading
+    return total
+
+def _report_progress(measure, total, status_queue, stop_event, interval=0.5):
+    """Puts (MsgKind.PROGRESS, fraction) on the queue every interval seconds until stop_event is set."""
+    while not stop_event.wait(interval): status_queue.put((MsgKind.PROGRESS, min(measure() / total, 1.0)))
+
+def _discard_partials(local_dir):
+    """Deletes the .incomplete files hf_hub_download keeps under local_dir, so the next download starts those files over."""
+    for partial in pathlib.Path(local_dir, ".cache", "huggingface", "download").rglob("*.incomplete"):
+        try: partial.unlink()
+        except OSError: pass # Still held by another download; it will be overwritten instead of resumed
+
+def _download_files_pooled(model_id, target, num_workers, info, status_queue, cancel_event, resume):
+    """Runs hf_hub_download for every sibling on a thread pool, reporting each finished file.
+
+    Threads, not processes: the work is I/O-bound (hf_transfer copies outside the GIL), and forking or spawning the
+    multithreaded Tk process would risk deadlocks and re-run this module's import-time environment setup.
+    """
+    if not resume: _discard_partials(target) # hf_hub_download would otherwise continue them; complete files are still reused
+    pool = ThreadPoolExecutor(max_workers=num_workers, thread_name_prefix="hf-file")
+    futures = {pool.submit(hf_hub_download, repo_id=model_id, filename=s["rfilename"], revision=info["sha"], local_dir=target, etag_timeout=ETAG_TIMEOUT): s["rfilename"] for s in info["siblings"]}
+    pending, done = set(futures), 0
+    try:
+        while pending:
+            # Wake at least every CANCEL_CHECK_INTERVAL, so a cancel is noticed even while one large file is still in flight
+            finished, pending = wait(pending, timeout=CANCEL_CHECK_INTERVAL, return_when=FIRST_COMPLETED)
+            for future in finished:
+                future.result(); done += 1
+                status_queue.put((MsgKind.LOG, f"Downloaded {futures[future]} ({done}/{len(futures)})"))
+            if cancel_event.is_set(): raise InterruptedError("Download cancelled during operation")
+    except BaseException:
+        # Queued files are dropped, but hf_hub_download cannot be interrupted, so wait for the ones in flight: returning
+        # early would report the job finished (and let the next one start) while their threads still write to disk
+        in_flight = sum(future.running() for future in pending)
+        if in_flight: status_queue.put((MsgKind.LOG, f"Waiting for {in_flight} file(s) already downloading to finish..."))
+        pool.shutdown(wait=True, cancel_futures=True); raise
+    pool.shutdown()
+    return target
+
+class MsgKind(IntEnum):
+    """Tags for the (kind, payload) tuples that download threads put on the status queue."""
+    LOG = 0
+    SUCCESS = 1
+    ERROR = 2
+    PROGRESS_START = 3
+    PROGRESS_END = 4
+    DONE = 5
+    PROGRESS = 6 # payload: fraction of bytes done, 0.0-1.0
+
+class WakingQueue(queue.SimpleQueue):
+    """SimpleQueue that also writes a byte to wake_fd on every put, so the GUI can wait on a pipe instead of polling.
+
+    SimpleQueue is already thread-safe and has none of Queue's task_done/maxsize bookkeeping, so producers need no extra lock.
+    """
+    def __init__(self, wake_fd=None):
+        super().__init__(); self.wake_fd = wake_fd
+
+    def put(self, item, block=True, timeout=None):
+        super().put(item, block, timeout)
+        if self.wake_fd is not None:
+            try: os.write(self.wake_fd, b"x")
+            except OSError: pass # Pipe full (a wakeup is already pending) or closed during shutdown
+
 # --- Threaded Download Functions ---
 # Modified slightly to check cancellation flag (though cannot interrupt mid-download)
-def download_single_file_threaded(model_id, filename, local_dir, status_queue, cancel_event):
+def download_single_file_threaded(model_id, filename, local_dir, status_queue, cancel_event, resume=True):
     """Downloads a single file in a thread and reports status via queue."""
-    status_queue.put(("PROGRESS_START", f"Downloading {filename}..."))
+    status_queue.put((MsgKind.PROGRESS_START, f"Downloading {filename}..."))
     file_path = None # Initialize file_path
     try:
         if cancel_event.is_set(): raise InterruptedError("Download cancelled before start") # Check before starting
-        status_queue.put(f"Starting download: {filename} from {model_id}...")
-        os.makedirs(local_dir, exist_ok=True)
-
-        # NOTE: hf_hub_download itself cannot be easily interrupted by the flag here.
-        # The cancellation primarily works by ignoring the result later.
-        file_path = hf_hub_download(
-            repo_id=model_id,
-            filename=filename,
-            local_dir=local_dir
-            # Removed deprecated local_dir_use_symlinks=False
-        )
+        status_queue.put((MsgKind.LOG, f"Starting download: {filename} from {model_id}..."))
+        reset_dir_cache(); ensure_dir_once(local_dir)
+
+        plan = _parallel_download_plan(model_id, filename)
+        if plan:
+            url, size, sha256, headers = plan
+            status_queue.put((MsgKind.LOG, f"Large file ({size / 2**20:.0f} MiB): using {PARALLEL_DOWNLOAD_CONNECTIONS} parallel connections..."))
+            dest = os.path.join(local_dir, filename); ensure_dir_once(os.path.dirname(dest))
+            file_path = parallel_single_download(url, dest, size, headers=headers, expected_sha256=sha256, cancel_event=cancel_event, client=HTTP_CLIENT, resume=resume)
+        else:
+            # NOTE: hf_hub_download itself cannot be easily interrupted by the flag here.
+            # The cancellation primarily works by ignoring the result later.
+            # It resumes partial files on its own, so without resume drop them first; complete files are still reused.
+            if not resume: _discard_partials(local_dir)
+            file_path = hf_hub_download(
+                repo_id=model_id,
+                filename=filename,
+                local_dir=local_dir,
+                # Removed deprecated local_dir_use_symlinks=False
+                etag_timeout=ETAG_TIMEOUT
+            )
         # Check cancellation *after* download completes but *before* sending success
         if cancel_event.is_set(): raise InterruptedError("Download cancelled during operation")
 
-        status_queue.put(f"SUCCESS: Downloaded {filename} from {model_id}\nSaved to: {file_path}")
+        status_queue.put((MsgKind.SUCCESS, f"SUCCESS: Downloaded {filename} from {model_id}\nSaved to: {file_path}"))
 
     except InterruptedError:
-         status_queue.put(f"INFO: Download task for {filename} acknowledged cancellation.")
+         status_queue.put((MsgKind.LOG, f"INFO: Download task for {filename} acknowledged cancellation."))
     except Exception as e:
         # Avoid sending error if cancellation happened during the download
         if not cancel_event.is_set():
             error_msg = str(e)
-            if "404" in error_msg or "not found" in error_msg.lower() or "repository not found" in error_msg.lower(): status_queue.put(f"ERROR: File or Repository not found.\nModel: {model_id}\nFile: {filename}\nDetails: {e}")
-            else: status_queue.put(f"ERROR: Download failed.\nDetails: {e}\n{traceback.format_exc()}")
+            if _NOT_FOUND_RE.search(error_msg): status_queue.put((MsgKind.ERROR, f"ERROR: File or Repository not found.\nModel: {model_id}\nFile: {filename}\nDetails: {e}"))
+            else:
+                import traceback # Only needed on this cold path
+                status_queue.put((MsgKind.ERROR, f"ERROR: Download failed.\nDetails: {e}\n{traceback.format_exc()}"))
         else:
-             status_queue.put(f"INFO: Download task for {filename} failed after cancellation request.")
+             status_queue.put((MsgKind.LOG, f"INFO: Download task for {filename} failed after cancellation request."))
     finally:
-        status_queue.put("PROGRESS_END")
-        status_queue.put("DONE_SINGLE") # Always signal completion
+        status_queue.put((MsgKind.PROGRESS_END, None))
+        status_queue.put((MsgKind.DONE, None)) # Always signal completion
 
 def validate_path(path_str):
     """Validates and resolves a directory path to prevent path traversal and ensure it's absolute."""
@@ -95,39 +314,89 @@ def validate_path(path_str):
     except (FileNotFoundError, RuntimeError) as e:
         raise ValueError(f"Invalid or non-existent path: {e}")
 
-def download_entire_model_threaded(model_id, local_dir_base, num_workers, status_queue, cancel_event):
+def download_entire_model_threaded(model_id, local_dir_base, num_workers, status_queue, cancel_event, high_performance=False, resume=True):
     """Downloads an entire model in a thread and reports status via queue."""
-    status_queue.put(("PROGRESS_START", f"Downloading {model_id} (workers={num_workers})..."))
+    status_queue.put((MsgKind.PROGRESS_START, f"Downloading {model_id} (workers={num_workers})..."))
     model_path = None # Initialize
+    stop_sampler = threading.Event()
     try:
         if cancel_event.is_set(): raise InterruptedError("Download cancelled before start")
-        status_queue.put(f"Starting download of entire model: {model_id} using {num_workers} workers...")
-        model_target_dir = os.path.join(local_dir_base, model_id); os.makedirs(model_target_dir, exist_ok=True)
-
-        # NOTE: snapshot_download itself cannot be easily interrupted by the flag here.
-        model_path = snapshot_download(
-            repo_id=model_id,
-            local_dir=model_target_dir,
-            # Removed deprecated local_dir_use_symlinks=False
-            max_workers=num_workers
-            # Ideally, snapshot_download would accept a cancellation token/event
-        )
+        status_queue.put((MsgKind.LOG, f"Starting download of entire model: {model_id} using {num_workers} workers..."))
+        xet_mode = set_xet_high_performance(high_performance)
+        if xet_mode != high_performance and HF_XET_AVAILABLE:
+            status_queue.put((MsgKind.LOG, f"Xet high-performance mode stays {'on' if xet_mode else 'off'} until the app is restarted; the new setting applies from the next launch."))
+        elif xet_mode: status_queue.put((MsgKind.LOG, "Xet high-performance mode enabled."))
+        reset_dir_cache(); model_target_dir = os.path.join(local_dir_base, model_id); ensure_dir_once(model_target_dir)
+
+        # Precompute sizes; the sibling sizes are also used to preallocate each target file
+        info = None
+        try:
+            info = cached_model_info(model_id)
+            status_queue.put((MsgKind.LOG, f"Model has {len(info['siblings'])} files ({sum(s['size'] or 0 for s in info['siblings']) / 2**20:,.1f} MiB total)."))
+        except Exception as info_err: status_queue.put((MsgKind.LOG, f"Warning: Could not get model info: {info_err}"))
+
+        # Byte progress is sampled every 500 ms, so it also works for hf_transfer/Xet, whose progress is opaque.
+        # Both the numerator and the total cover only the bytes this run fetches, so files already on disk don't count as progress
+        expected_bytes = sum(s["size"] or 0 for s in info["siblings"]) if info else 0
+        def start_sampler(measure=None, total=None):
+            if measure is None:
+                present = _dir_bytes(model_target_dir); total = expected_bytes - present
+                measure = lambda: max(_dir_bytes(model_target_dir) - present, 0)
+            if total and total > 0: threading.Thread(target=_report_progress, args=(measure, total, status_queue, stop_sampler), daemon=True).start()
+
+        # hf_transfer and Xet high-performance mode are library-internal fast paths the async engine would bypass
+        if info and ASYNC_ENGINE_AVAILABLE and not high_performance and not hf_transfer_enabled():
+            # Skip files that are already complete (resume only decides whether partial files are continued); verified hashes are remembered across runs
+            cache_dir = os.path.join(local_dir_base, ".cache"); ensure_dir_once(cache_dir)
+            status_queue.put((MsgKind.LOG, f"Verifying {len(info['siblings'])} files against the Hub checksums..."))
+            siblings = []
+            with shelve.open(os.path.join(cache_dir, "etags.db")) as verified:
+                for s in info["siblings"]:
+                    # Hashing large files already on disk can take minutes, so honour a cancel between files
+                    if cancel_event.is_set(): raise InterruptedError("Download cancelled during verification")
+                    if needs_download(os.path.join(model_target_dir, s["rfilename"]), s, verified): siblings.append(s)
+            if len(siblings) < len(info["siblings"]): status_queue.put((MsgKind.LOG, f"Skipping {len(info['siblings']) - len(siblings)} files already present."))
+            files = {s["rfilename"]: s["size"] for s in siblings}
+            # Preallocated files already have their final size on disk, so count received bytes instead
+            written = [0]; start_sampler(lambda: written[0], sum(size or 0 for size in files.values()))
+            status_queue.put((MsgKind.LOG, f"Fetching {len(files)} files with up to {num_workers * 2} concurrent connections..."))
+            model_path = run_async(_snapshot_async(model_id, model_target_dir, num_workers * 2, files, info["sha"], status_queue, cancel_event, resume, written))
+        elif info and not high_performance:
+            start_sampler()
+            status_queue.put((MsgKind.LOG, f"Fetching {len(info['siblings'])} files with {num_workers} threads..."))
+            model_path = _download_files_pooled(model_id, model_target_dir, num_workers, info, status_queue, cancel_event, resume)
+        else:
+            start_sampler()
+            # Xet shares one connection pool across files only inside snapshot_download
+            if not resume: _discard_partials(model_target_dir)
+            # NOTE: snapshot_download itself cannot be easily interrupted by the flag here.
+            model_path = snapshot_download(
+                repo_id=model_id,
+                local_dir=model_target_dir,
+                # Removed deprecated local_dir_use_symlinks=False
+                max_workers=num_workers,
+                # Ideally, snapshot_download would accept a cancellation token/event
+                etag_timeout=ETAG_TIMEOUT
+            )
         if cancel_event.is_set(): raise InterruptedError("Download cancelled during operation")
 
-        status_queue.put(f"SUCCESS: Downloaded entire model {model_id}\nSaved to: {model_path}")
+        status_queue.put((MsgKind.SUCCESS, f"SUCCESS: Downloaded entire model {model_id}\nSaved to: {model_path}"))
 
     except InterruptedError:
-         status_queue.put(f"INFO: Download task for {model_id} acknowledged cancellation.")
+         status_queue.put((MsgKind.LOG, f"INFO: Download task for {model_id} acknowledged cancellation."))
     except Exception as e:
         if not cancel_event.is_set():
             error_msg = str(e)
-            if "404" in error_msg or "not found" in error_msg.lower() or "repository not found" in error_msg.lower(): status_queue.put(f"ERROR: Model or Repository not found.\nModel: {model_id}\nDetails: {e}")
-            else: status_queue.put(f"ERROR: Download failed.\nDetails: {e}\n{traceback.format_exc()}")
+            if _NOT_FOUND_RE.search(error_msg): status_queue.put((MsgKind.ERROR, f"ERROR: Model or Repository not found.\nModel: {model_id}\nDetails: {e}"))
+            else:
+                import traceback # Only needed on this cold path
+                status_queue.put((MsgKind.ERROR, f"ERROR: Download failed.\nDetails: {e}\n{traceback.format_exc()}"))
         else:
-            status_queue.put(f"INFO: Download task for {model_id} failed after cancellation request.")
+            status_queue.put((MsgKind.LOG, f"INFO: Download task for {model_id} failed after cancellation request."))
     finally:
-         status_queue.put("PROGRESS_END")
-         status_queue.put("DONE_MODEL") # Always signal completion
+         stop_sampler.set()
+         status_queue.put((MsgKind.PROGRESS_END, None))
+         status_queue.put((MsgKind.DONE, None)) # Always signal completion
 
 
 # --- GUI Application Class ---
@@ -135,6 +404,8 @@ class HuggingFaceDownloaderApp:
     def __init__(self, root):
         self.root = root
         self.root.title("Hugging Face Downloader")
+        self._alive = True # Cleared by _on_close so nothing reschedules onto a destroyed window
+        self.root.protocol("WM_DELETE_WINDOW", self._on_close)
         self.root.geometry("700x950")
         self.root.config(bg=BG_COLOR)
 
@@ -163,18 +434,27 @@ class HuggingFaceDownloaderApp:
         self.style.map('TCombobox', fieldbackground=[('!disabled', ENTRY_BG)], foreground=[('!disabled', ENTRY_FG)], selectbackground=ENTRY_BG, selectforeground=FG_COLOR, insertcolor=FG_COLOR, arrowcolor=FG_COLOR)
         self.root.option_add('*TCombobox*Listbox.background', ENTRY_BG); self.root.option_add('*TCombobox*Listbox.foreground', FG_COLOR)
         self.root.option_add('*TCombobox*Listbox.selectBackground', SELECT_BG); self.root.option_add('*TCombobox*Listbox.selectForeground', SELECT_FG)
+        self.style.configure('TCheckbutton', background=BG_COLOR, foreground=FG_COLOR)
+        self.style.map('TCheckbutton', background=[('active', BG_COLOR)], foreground=[('disabled', BUTTON_ACTIVE_BG)])
         self.style.configure('Horizontal.TProgressbar', troughcolor=PROGRESS_TROUGH, background=PROGRESS_BAR, thickness=15)
         self.style.configure('Vertical.TScrollbar', background=BUTTON_BG, troughcolor=BG_COLOR, bordercolor=BG_COLOR, arrowcolor=FG_COLOR)
         self.style.map('Vertical.TScrollbar', background=[('active', BUTTON_ACTIVE_BG)])
 
         # --- Shared Variables ---
         self.default_save_dir = tk.StringVar(value=os.path.join(os.path.expanduser("~"), "hf_models"))
-        self.status_queue = queue.Queue()
+        self.status_queue = WakingQueue()
+        # One long-lived worker thread runs downloads one at a time; the workers report DONE on the queue themselves
+        self._dl_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="hf-dl"); self._current_future = None
+        self._progress_depth = 0 # Unmatched PROGRESS_START messages
+        self._deferred_logs = []; self._deferred_status = None; self._flush_scheduled = False # Log lines and status waiting for the next idle flush
         self.speed_selection = tk.StringVar()
         self.sf_model_id_var = tk.StringVar()
         self.em_model_id_var = tk.StringVar()
+        self.use_hf_transfer = tk.BooleanVar(value=HF_TRANSFER_AVAILABLE)
+        self.resume_var = tk.BooleanVar(value=True)
         self.cancel_requested = threading.Event()
         self.download_active = False
+        self._opener = None if sys.platform == "win32" else (shutil.which("xdg-open") or shutil.which("open")) # Resolved once, not per click
 
         # --- Main Frame ---
         main_frame = ttk.Frame(self.root, padding="10", style='TFrame')
@@ -200,6 +480,8 @@ class HuggingFaceDownloaderApp:
         self.browse_button.grid(row=0, column=2, padx=(5, 2), pady=5)
         self.open_dir_button = ttk.Button(dir_frame, text="Open...", command=self.open_download_directory, style='TButton')
         self.open_dir_button.grid(row=0, column=3, padx=(2, 5), pady=5)
+        self.resume_check = ttk.Checkbutton(dir_frame, text="Resume partial downloads", variable=self.resume_var, style='TCheckbutton')
+        self.resume_check.grid(row=1, column=1, padx=5, pady=(0, 5), sticky="w")
         dir_frame.columnconfigure(1, weight=1)
 
         # --- Single File Download Section ---
@@ -222,9 +504,12 @@ class HuggingFaceDownloaderApp:
         speed_frame.pack(fill=tk.X, pady=(10, 10))
         ttk.Label(speed_frame, text="Workers:", font=self.bold_font, style='TLabel').pack(side=tk.LEFT, padx=(0, 5))
         speed_options = ["Normal (1 worker)", "Fast (3 workers)", "Ultra (6 workers)"]
+        if HF_XET_AVAILABLE: speed_options.append(XET_SPEED_OPTION)
         self.speed_dropdown = ttk.Combobox(speed_frame, textvariable=self.speed_selection, values=speed_options, state="readonly", width=20, style='TCombobox')
         self.speed_dropdown.pack(side=tk.LEFT)
         self.speed_dropdown.set("Fast (3 workers)")
+        self.hf_transfer_check = ttk.Checkbutton(speed_frame, text="Use hf_transfer (Rust)", variable=self.use_hf_transfer, style='TCheckbutton', state=tk.NORMAL if HF_TRANSFER_AVAILABLE else tk.DISABLED)
+        self.hf_transfer_check.pack(side=tk.LEFT, padx=(15, 0))
 
         # --- Entire Model Download Section ---
         model_frame = ttk.LabelFrame(main_frame, text="Download Entire Model", padding="10")
@@ -235,12 +520,13 @@ class HuggingFaceDownloaderApp:
         self.em_model_id_var.set(self.sf_model_id_var.get())
         self.em_download_button = ttk.Button(model_frame, text="Download Model", command=self.start_entire_model_download, style='TButton')
         self.em_download_button.grid(row=1, column=0, columnspan=2, pady=10)
+        self._dl_buttons = (self.sf_download_button, self.em_download_button) # Toggled together while a download runs
         model_frame.columnconfigure(1, weight=1)
 
         # --- Status Log Area ---
         status_frame = ttk.LabelFrame(main_frame, text="Status Log", padding="10")
         status_frame.pack(fill=tk.BOTH, expand=True, pady=(10, 0))
-        self.status_text = scrolledtext.ScrolledText(status_frame, height=10, wrap=tk.WORD, state=tk.DISABLED, bg=TEXT_BG, fg=LOG_TEXT_FG, selectbackground=SELECT_BG, selectforeground=SELECT_FG, insertbackground=FG_COLOR)
+        self.status_text = scrolledtext.ScrolledText(status_frame, height=10, wrap=tk.WORD, state=tk.DISABLED, bg=TEXT_BG, fg=LOG_TEXT_FG, selectbackground=SELECT_BG, selectforeground=SELECT_FG, insertbackground=FG_COLOR, undo=False, autoseparators=False, maxundo=0) # Read-only log: no undo history
         self.status_text.pack(side=tk.TOP, fill=tk.BOTH, expand=True)
         log_buttons_frame = ttk.Frame(status_frame, style='TFrame')
         log_buttons_frame.pack(fill=tk.X, pady=(5, 0))
@@ -254,10 +540,21 @@ class HuggingFaceDownloaderApp:
         self.log_context_menu.add_command(label="Copy", command=self.copy_log_text)
         self.status_text.bind("<Button-3>", self.show_log_context_menu)
         self.status_text.bind("<Button-2>", self.show_log_context_menu)
+        # Lines logged while the log is not viewable (e.g. minimized) are buffered and written once it is shown again
+        self._hidden_log = deque(); self._hidden_lines = 0 # Capped by line count like the widget itself
+        self.root.bind("<Map>", self._show_hidden_log) # Restoring a minimized window maps the toplevel, not its children; Windows has no <Visibility>
 
         # --- Initial Setup ---
         self.sf_model_id_var.trace_add('write', self.sync_model_ids)
-        self.check_queue()
+        if sys.platform != "win32" and hasattr(self.root.tk, "createfilehandler"):
+            # Event-driven: producers write to the pipe and Tk wakes only when a message arrives
+            self._wake_r, self._wake_w = os.pipe(); os.set_blocking(self._wake_r, False); os.set_blocking(self._wake_w, False)
+            self.status_queue.wake_fd = self._wake_w
+            self.root.tk.createfilehandler(self._wake_r, tk.READABLE, self._drain_queue)
+        elif self.root.tk.call("info", "exists", "tcl_platform(threaded)"):
+            # Tk cannot watch file descriptors on Windows; a thread blocks on the queue and hands batches to the mainloop instead
+            threading.Thread(target=self._pump_queue, name="status-pump", daemon=True).start()
+        else: self._poll_id = None; self._last_msg_tick = 0.0; self.check_queue() # after_idle is unsafe from threads without a threaded Tcl, so poll
         self.update_status_bar("Ready")
 
     # --- Methods for GUI Actions ---
@@ -266,6 +563,15 @@ class HuggingFaceDownloaderApp:
         try: self.em_model_id_var.set(self.sf_model_id_var.get())
         except Exception as e: print(f"Error syncing model IDs: {e}")
 
+    def _on_close(self):
+        self._alive = False
+        # Queued jobs are dropped; a running one is abandoned by the os._exit after mainloop
+        self.cancel_requested.set(); self._dl_pool.shutdown(wait=False, cancel_futures=True)
+        if getattr(self, "_wake_r", None) is not None:
+            # The pipe stays open: a worker may still be writing its last wakeup, and the process is about to exit anyway
+            self.status_queue.wake_fd = None; self.root.tk.deletefilehandler(self._wake_r)
+        self.root.destroy()
+
     def cancel_download(self):
         if self.download_active:
             self.log_status(">>> Cancellation Requested <<<")
@@ -282,25 +588,36 @@ class HuggingFaceDownloaderApp:
             safe_path_str = str(valid_path)
 
             self.update_status_bar(f"Opening directory: {safe_path_str}")
-            if sys.platform == "win32": os.startfile(safe_path_str)
-            elif sys.platform == "darwin": subprocess.call(["open", safe_path_str])
-            else: subprocess.call(["xdg-open", safe_path_str])
+            # Never wait on the file manager: a slow desktop helper would freeze the mainloop
+            if sys.platform == "win32": self.root.after_idle(self._startfile, safe_path_str); return
+            if not self._opener: raise FileNotFoundError("xdg-open/open not found")
+            import subprocess
+            subprocess.Popen([self._opener, safe_path_str], stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True)
             self.update_status_bar(f"Opened directory.")
         except ValueError as e:
             messagebox.showwarning("Open Directory", f"Invalid directory path:\n{e}")
             self.update_status_bar("Selected directory is invalid.")
             return
         except FileNotFoundError: messagebox.showerror("Open Directory Error", f"Could not find command to open directory."); self.update_status_bar("Error opening directory: command not found.")
-        except Exception as e: messagebox.showerror("Open Directory Error", f"Failed to open directory.\nError: {e}"); self.update_status_bar("Error opening directory."); print(f"Error opening directory: {e}\n{traceback.format_exc()}")
+        except Exception as e:
+            import traceback
+            messagebox.showerror("Open Directory Error", f"Failed to open directory.\nError: {e}"); self.update_status_bar("Error opening directory."); print(f"Error opening directory: {e}\n{traceback.format_exc()}")
+
+    def _startfile(self, path):
+        try: os.startfile(path); self.update_status_bar("Opened directory.")
+        except Exception as e: messagebox.showerror("Open Directory Error", f"Failed to open directory.\nError: {e}"); self.update_status_bar("Error opening directory.")
 
     def clear_status_log(self):
+        self._hidden_log.clear(); self._hidden_lines = 0; self._deferred_logs = []
         self.status_text.config(state=tk.NORMAL); self.status_text.delete(1.0, tk.END); self.status_text.config(state=tk.DISABLED)
 
     def save_status_log(self):
+        self._sync_log()
         log_content = self.status_text.get(1.0, tk.END).strip()
         if not log_content: messagebox.showinfo("Save Log", "Log is empty, nothing to save."); return
         filepath = filedialog.asksaveasfilename(title="Save Status Log", defaultextension=".log", filetypes=[("Log files", "*.log"), ("Text files", "*.txt"), ("All files", "*.*")], initialdir=os.getcwd())
         if not filepath: return
+        self.update_status_bar("Saving log..."); self._force_repaint() # The write below blocks the mainloop
         try:
             with open(filepath, 'w', encoding='utf-8') as f: f.write(log_content)
             self.update_status_bar(f"Log saved to {os.path.basename(filepath)}"); messagebox.showinfo("Save Log", f"Log successfully saved to:\n{filepath}")
@@ -311,6 +628,7 @@ class HuggingFaceDownloaderApp:
         finally: self.log_context_menu.grab_release()
 
     def copy_log_text(self):
+        self._sync_log()
         try: selected_text = self.status_text.get(tk.SEL_FIRST, tk.SEL_LAST); text_to_copy = selected_text
         except tk.TclError: text_to_copy = self.status_text.get(1.0, tk.END).strip()
         if text_to_copy: self.root.clipboard_clear(); self.root.clipboard_append(text_to_copy); self.update_status_bar("Log content copied to clipboard.")
@@ -321,70 +639,172 @@ class HuggingFaceDownloaderApp:
         if directory: self.default_save_dir.set(directory)
 
     def update_status_bar(self, message):
-        self.status_bar_label.config(text=message); self.root.update_idletasks()
+        # A direct write is newer than any result line still waiting for the idle flush, which must not overwrite it
+        self._deferred_status = None
+        self.status_bar_label.config(text=message) # Repainted by mainloop at the next idle
+
+    def _force_repaint(self):
+        # Only for callers about to block the mainloop; never call this from the queue drain
+        self.root.update_idletasks()
 
     def start_progress(self, message="Processing..."):
         self.update_status_bar(message); self.progress_bar.config(mode='indeterminate'); self.progress_bar.start(10)
 
+    def _set_progress_fraction(self, fraction):
+        if str(self.progress_bar.cget('mode')) != 'determinate': self.progress_bar.stop(); self.progress_bar.config(mode='determinate', maximum=100)
+        self.progress_bar.config(value=fraction * 100)
+
     def stop_progress(self, final_message="Ready"):
         self.progress_bar.stop(); self.progress_bar.config(mode='determinate', value=0); self.update_status_bar(final_message)
 
     def log_status(self, message):
-        if not self.download_active or not self.cancel_requested.is_set() or "cancel" in message.lower():
-             self.status_text.config(state=tk.NORMAL); self.status_text.insert(tk.END, message + "\n\n"); self.status_text.see(tk.END); self.status_text.config(state=tk.DISABLED)
+        # Only lower() the message in the rare cancelled-download case
+        if self.download_active and self.cancel_requested.is_set() and "cancel" not in message.lower(): return
+        self._defer_flush([message])
+
+    def _show_hidden_log(self, _event=None):
+        if self._hidden_log:
+            messages = list(self._hidden_log); self._hidden_log.clear(); self._hidden_lines = 0; self._flush_logs(messages)
+
+    def _sync_log(self):
+        # Writes buffered and not-yet-flushed lines into the widget, visible or not, before it is read
+        messages = list(self._hidden_log) + self._deferred_logs
+        self._hidden_log.clear(); self._hidden_lines = 0; self._deferred_logs = []
+        if messages: self._flush_logs(messages, force=True)
+
+    def _defer_flush(self, messages, status=None):
+        # Everything logged before the next idle shares one insert and one see(END)
+        if not self._flush_scheduled: self._flush_scheduled = True; self.root.after_idle(self._flush_deferred)
+        self._deferred_logs.extend(messages)
+        if status: self._deferred_status = status
+
+    def _flush_deferred(self):
+        messages, status = self._deferred_logs, self._deferred_status
+        self._deferred_logs, self._deferred_status, self._flush_scheduled = [], None, False
+        self._flush_logs(messages, status) # status is None if a direct status write came after it
+
+    def _flush_logs(self, messages, status=None, force=False):
+        if status: self.update_status_bar(status)
+        if not messages: return
+        if not force and not self.status_text.winfo_viewable():
+            # Skip text layout nobody can see; drop the oldest buffered lines past the widget's own cap
+            self._hidden_log.extend(messages); self._hidden_lines += sum(_log_line_count(m) for m in messages)
+            while self._hidden_lines > LOG_MAX_LINES: self._hidden_lines -= _log_line_count(self._hidden_log.popleft())
+            return
+        # Lines buffered while hidden go first; this also catches the case where no <Map> announced the log becoming visible
+        if self._hidden_log: messages = list(self._hidden_log) + messages; self._hidden_log.clear(); self._hidden_lines = 0
+        # One state toggle, insert and scroll for the whole batch instead of one per message
+        self.status_text.config(state=tk.NORMAL); self.status_text.insert(tk.END, "".join(f"\n{m}\n" if m.startswith(_LOG_BREAK_PREFIXES) else f"{m}\n" for m in messages))
+        # Trim the oldest lines past the cap so the text B-tree (and every insert/see) stays small on long model downloads
+        if int(self.status_text.index('end-1c').split('.')[0]) > LOG_MAX_LINES: self.status_text.delete('1.0', f'end-{LOG_MAX_LINES}l')
+        self.status_text.see(tk.END); self.status_text.config(state=tk.DISABLED)
 
     def _start_download_ui_updates(self):
         self.download_active = True; self.cancel_requested.clear()
-        self.sf_download_button.config(state=tk.DISABLED); self.em_download_button.config(state=tk.DISABLED)
+        if getattr(self, "_poll_id", None): self.root.after_cancel(self._poll_id); self._poll_id = self.root.after(33, self.check_queue) # Don't wait out an idle-rate tick
+        for button in self._dl_buttons: button.config(state=tk.DISABLED)
         self.cancel_button.config(state=tk.NORMAL)
 
     def _end_download_ui_updates(self, status_message="Ready"):
         self.download_active = False
-        self.sf_download_button.config(state=tk.NORMAL); self.em_download_button.config(state=tk.NORMAL)
+        for button in self._dl_buttons: button.config(state=tk.NORMAL)
         self.cancel_button.config(state=tk.DISABLED)
         self.stop_progress(status_message); self.cancel_requested.clear()
 
     def start_single_file_download(self):
+        """Queues a single-file download. self.cancel_requested is the worker's cancel handle: wait on it (Event.wait(timeout)) instead of sleeping."""
         if self.download_active: return
         model_id = self.sf_model_id_var.get().strip(); filename = self.sf_filename_entry.get().strip(); local_dir = self.default_save_dir.get().strip()
         if not model_id or not filename or not local_dir: messagebox.showwarning("Input Error", "Please enter Model ID, Filename, and select a Save Directory."); return
         self._start_download_ui_updates(); self.log_status(f"Queueing single file download: {filename} from {model_id}")
-        threading.Thread(target=download_single_file_threaded, args=(model_id, filename, local_dir, self.status_queue, self.cancel_requested), daemon=True).start()
+        set_hf_transfer(self.use_hf_transfer.get())
+        self._current_future = self._dl_pool.submit(download_single_file_threaded, model_id, filename, local_dir, self.status_queue, self.cancel_requested, self.resume_var.get())
 
     def start_entire_model_download(self):
+        """Queues a full-model download. self.cancel_requested is the worker's cancel handle: wait on it (Event.wait(timeout)) instead of sleeping."""
         if self.download_active: return
         model_id = self.em_model_id_var.get().strip(); local_dir_base = self.default_save_dir.get().strip(); selection_str = self.speed_selection.get()
         workers = 3
         try:
-            match = re.search(r'\d+', selection_str)
+            match = _WORKER_RE.search(selection_str)
             if match: workers = int(match.group(0))
             else: self.log_status(f"Warning: Could not parse worker count from '{selection_str}'. Defaulting to {workers}.")
         except Exception as parse_err: self.log_status(f"Warning: Error parsing worker count '{selection_str}'. Defaulting to {workers}. Error: {parse_err}")
         if not model_id or not local_dir_base: messagebox.showwarning("Input Error", "Please enter Model ID and select a Base Save Directory."); return
         self._start_download_ui_updates(); self.log_status(f"Queueing entire model download: {model_id} ({workers} workers)")
-        threading.Thread(target=download_entire_model_threaded, args=(model_id, local_dir_base, workers, self.status_queue, self.cancel_requested), daemon=True).start()
+        set_hf_transfer(self.use_hf_transfer.get())
+        self._current_future = self._dl_pool.submit(download_entire_model_threaded, model_id, local_dir_base, workers, self.status_queue, self.cancel_requested, selection_str == XET_SPEED_OPTION, self.resume_var.get())
 
-    def check_queue(self):
+    # --- Status Queue Handlers (one per MsgKind) ---
+    def _on_log(self, text):
+        if not self._cancelled: self._pending_logs.append(text)
+
+    def _on_result(self, text):
+        if not self._cancelled: self._pending_logs.append(text); self._pending_status = text.partition('\n')[0]
+
+    def _on_progress_start(self, text):
+        self._progress_depth += 1
+        if not self._cancelled: self._pending_status = None; self._progress_text = text
+
+    def _on_progress(self, fraction):
+        if not self._cancelled: self._pending_fraction = fraction
+
+    def _on_progress_end(self, _payload):
+        self._progress_depth = max(self._progress_depth - 1, 0)
+        if not self._progress_depth and not self.download_active: self.stop_progress()
+
+    def _on_done(self, _payload):
+        self._pending_status = None; final_status = "Ready"
+        if self.cancel_requested.is_set(): self._pending_logs.append("--- Download Cancelled by User. ---"); final_status = "Cancelled"
+        self._end_download_ui_updates(final_status); self._cancelled = False; self._progress_depth = 0 # The flag was just cleared and the bar stopped
+
+    _HANDLERS = {MsgKind.LOG: _on_log, MsgKind.SUCCESS: _on_result, MsgKind.ERROR: _on_result, MsgKind.PROGRESS_START: _on_progress_start, MsgKind.PROGRESS_END: _on_progress_end, MsgKind.DONE: _on_done, MsgKind.PROGRESS: _on_progress}
+
+    def _apply_batch(self, batch):
+        # Handlers collect log lines and the latest result line; both are applied once per batch
+        # Event.is_set() takes a lock, so read the flag once per batch; _on_done re-reads it
+        # The bar only starts if a PROGRESS_START is still unmatched at the end of the batch, so short jobs never animate
+        self._pending_logs = []; self._pending_status = None; self._cancelled = self.cancel_requested.is_set()
+        self._progress_text = None; self._pending_fraction = None
         try:
-            while True:
-                message_item = self.status_queue.get_nowait()
-                if isinstance(message_item, tuple) and message_item[0] == "PROGRESS_START":
-                    if not self.cancel_requested.is_set(): self.start_progress(message_item[1])
-                    continue
-                if message_item == "DONE_SINGLE" or message_item == "DONE_MODEL":
-                    final_status = "Ready";
-                    if self.cancel_requested.is_set(): self.log_status("--- Download Cancelled by User. ---"); final_status = "Cancelled"
-                    self._end_download_ui_updates(final_status); continue
-                if message_item == "PROGRESS_END":
-                    if not self.download_active: self.stop_progress()
-                    continue
-                if not self.cancel_requested.is_set():
-                    self.log_status(message_item)
-                    if isinstance(message_item, str):
-                        first_line = message_item.split('\n', 1)[0]
-                        if "ERROR:" in first_line or "SUCCESS:" in first_line: self.update_status_bar(first_line)
+            for kind, payload in batch: self._HANDLERS[kind](self, payload)
+        finally:
+            if self._progress_depth and self._progress_text is not None: self.start_progress(self._progress_text)
+            if self._progress_depth and self._pending_fraction is not None: self._set_progress_fraction(self._pending_fraction)
+            # Text widget work waits for idle, so Tk can service expose/resize events queued behind the drain first
+            if self._pending_logs or self._pending_status: self._defer_flush(self._pending_logs, self._pending_status)
+        return len(batch)
+
+    def _process_queue(self):
+        batch = []
+        try:
+            while True: batch.append(self.status_queue.get_nowait())
         except queue.Empty: pass
-        finally: self.root.after(100, self.check_queue)
+        return self._apply_batch(batch) if batch else 0
+
+    def _pump_queue(self):
+        # Runs on its own thread: sleeps in get() until a message arrives, then hands everything queued so far to the mainloop
+        while True:
+            batch = [self.status_queue.get()]
+            try:
+                while True: batch.append(self.status_queue.get_nowait())
+            except queue.Empty: pass
+            try: self.root.after_idle(self._apply_batch, batch)
+            except (RuntimeError, tk.TclError): return # The mainloop has gone away
+
+    def _drain_queue(self, fd, mask):
+        try:
+            while os.read(fd, 4096): pass # Clear pending wakeups; one drain handles them all
+        except BlockingIOError: pass
+        self._process_queue()
+
+    def check_queue(self):
+        try:
+            if self._process_queue(): self._last_msg_tick = time.monotonic()
+        finally:
+            # ~30 Hz during downloads, 5 Hz for a second after the last message (late results), 2 Hz when idle
+            recent = time.monotonic() - self._last_msg_tick < 1.0
+            if self._alive: self._poll_id = self.root.after(33 if self.download_active else (200 if recent else 500), self.check_queue)
 
 # --- Run the Application ---
 if __name__ == "__main__":
@@ -393,8 +813,15 @@ if __name__ == "__main__":
         root = tk.Tk()
         app = HuggingFaceDownloaderApp(root)
         root.mainloop()
-        print("GUI closed.")
+        print("GUI closed.", flush=True)
+        # Pool threads are not daemons and are joined at exit, and hf_hub_download/snapshot_download only see the
+        # cancel flag between files, so don't keep a windowless process alive until a running download finishes.
+        # A short grace period still lets a range download that saw the cancel save its resume record first.
+        if app._current_future is not None:
+            wait([app._current_future], timeout=EXIT_GRACE_PERIOD)
+            if not app._current_future.done(): os._exit(0)
     except Exception as e:
+        import traceback
         print(f"Fatal Application Error: {e}\n{traceback.format_exc()}")
         try: root_err = tk.Tk(); root_err.withdraw(); messagebox.showerror("Application Error", f"An unexpected error occurred: {e}"); root_err.destroy()
         except Exception as e2: print(f"Could not show final error dialog: {e2}")
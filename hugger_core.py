@@ -0,0 +1,234 @@
+"""Download helpers shared by the Hugging Hugger GUI and CLI HUG.
+
+Importing this module also imports huggingface_hub, so the environment variables it reads at import
+time are set here first.
+"""
+import os
+import re
+import json
+import time
+import hashlib
+import mmap
+import threading
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# --- Model Info Cache ---
+MODEL_INFO_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "hugger", "model_info")
+MODEL_INFO_TTL = 3600 # Seconds before a cached model_info entry is refetched
+
+# --- Download Settings ---
+PARALLEL_DOWNLOAD_THRESHOLD = 64 * 1024 * 1024 # Files above this size use ranged parallel download
+PARALLEL_DOWNLOAD_CONNECTIONS = 8
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024 # Bytes read per iteration of a streamed download
+
+# Optional Rust downloader (pip install hf_transfer); only used by huggingface_hub releases that still support it
+try:
+    import hf_transfer  # noqa: F401
+    _HF_TRANSFER_INSTALLED = True
+except ImportError:
+    _HF_TRANSFER_INSTALLED = False
+
+# Optional Xet storage backend (shared connection pool + chunk dedup for snapshots)
+try:
+    import hf_xet  # noqa: F401
+    HF_XET_AVAILABLE = True
+except ImportError:
+    HF_XET_AVAILABLE = False
+
+# Read by huggingface_hub at import time; the default 10 s stalls out on slow CDN edges
+os.environ.setdefault("HF_HUB_DOWNLOAD_TIMEOUT", "60")
+
+from huggingface_hub import model_info, hf_hub_url, get_hf_file_metadata
+from huggingface_hub import constants as hf_constants
+from huggingface_hub.utils import build_hf_headers
+
+# Newer huggingface_hub releases dropped hf_transfer and only warn about HF_HUB_ENABLE_HF_TRANSFER, so
+# leave the variable alone unless the installed release still reads it
+HF_TRANSFER_AVAILABLE = _HF_TRANSFER_INSTALLED and hasattr(hf_constants, "HF_HUB_ENABLE_HF_TRANSFER")
+
+# Optional pooled HTTP client; urllib is used without it
+try:
+    import httpx
+    HTTPX_AVAILABLE = True
+except ImportError:
+    HTTPX_AVAILABLE = False
+
+def set_hf_transfer(enabled):
+    """Enables or disables the hf_transfer backend for subsequent downloads. Returns the applied state."""
+    enabled = bool(enabled) and HF_TRANSFER_AVAILABLE
+    if enabled: os.environ["HF_HUB_ENABLE_HF_TRANSFER"] = "1"
+    else: os.environ.pop("HF_HUB_ENABLE_HF_TRANSFER", None)
+    # huggingface_hub reads the variable once at import, so mirror it into its constants too
+    if hasattr(hf_constants, "HF_HUB_ENABLE_HF_TRANSFER"): hf_constants.HF_HUB_ENABLE_HF_TRANSFER = enabled
+    return enabled
+
+def hf_transfer_enabled():
+    """Returns True if huggingface_hub will actually hand downloads to hf_transfer."""
+    return HF_TRANSFER_AVAILABLE and bool(getattr(hf_constants, "HF_HUB_ENABLE_HF_TRANSFER", False))
+
+# On by default where supported, unless the user already set the variable
+if HF_TRANSFER_AVAILABLE and "HF_HUB_ENABLE_HF_TRANSFER" not in os.environ: set_hf_transfer(True)
+
+_XET_HIGH_PERFORMANCE = None # Mode hf_xet runs with; it reads HF_XET_HIGH_PERFORMANCE once per process
+
+def set_xet_high_performance(enabled):
+    """Requests Xet high-performance mode for this process. Returns the mode actually in effect.
+
+    hf_xet caches the setting when it first starts, so only the first call takes effect; later requests
+    for the other mode apply from the next launch.
+    """
+    global _XET_HIGH_PERFORMANCE
+    if _XET_HIGH_PERFORMANCE is not None: return _XET_HIGH_PERFORMANCE
+    enabled = _XET_HIGH_PERFORMANCE = bool(enabled) and HF_XET_AVAILABLE
+    if enabled: os.environ["HF_XET_HIGH_PERFORMANCE"] = "1"
+    else: os.environ.pop("HF_XET_HIGH_PERFORMANCE", None)
+    if hasattr(hf_constants, "HF_XET_HIGH_PERFORMANCE"): hf_constants.HF_XET_HIGH_PERFORMANCE = enabled
+    return enabled
+
+def cached_model_info(repo_id, ttl=MODEL_INFO_TTL, cache_dir=MODEL_INFO_CACHE_DIR):
+    """Returns {"sha": ..., "siblings": [{"rfilename", "size", "sha256", "blob_id"}]} for a repo, using a disk cache younger than ttl seconds."""
+    cache_file = os.path.join(cache_dir, repo_id.replace("/", "--") + ".json")
+    try:
+        if time.time() - os.path.getmtime(cache_file) < ttl:
+            with open(cache_file, encoding="utf-8") as f: return json.load(f)
+    except (OSError, ValueError): pass # Missing, unreadable or corrupt entries are simply refetched
+    info = model_info(repo_id, files_metadata=True)
+    # sha256 is only set for LFS/Xet files; blob_id is the git SHA1 the Hub uses as etag for the rest
+    data = {"sha": info.sha, "siblings": [{"rfilename": s.rfilename, "size": s.size, "sha256": getattr(s.lfs, "sha256", None), "blob_id": s.blob_id} for s in info.siblings]}
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        with open(cache_file + ".tmp", "w", encoding="utf-8") as f: json.dump(data, f)
+        os.replace(cache_file + ".tmp", cache_file)
+    except OSError: pass # Caching is best-effort
+    return data
+
+def make_http_client(http2=False):
+    """Creates a keep-alive httpx client shared across downloads, or returns None if httpx is missing.
+
+    Leave http2 off for range downloads: HTTP/2 multiplexes every request to a host over one TCP
+    connection, so the parallel ranges would share a single connection's throughput.
+    """
+    if not HTTPX_AVAILABLE: return None
+    limits = httpx.Limits(max_connections=32, max_keepalive_connections=16)
+    transport = None
+    if http2:
+        try: transport = httpx.HTTPTransport(http2=True, retries=3, limits=limits)
+        except ImportError: pass # h2 not installed
+    if transport is None: transport = httpx.HTTPTransport(retries=3, limits=limits)
+    return httpx.Client(transport=transport, timeout=httpx.Timeout(60.0), follow_redirects=True)
+
+# --- Hashing ---
+def _file_digest(path, make_hash):
+    """Hashes a whole file in C: hashlib.file_digest on Python 3.11+, a read-only mmap before that."""
+    with open(path, "rb") as f:
+        if hasattr(hashlib, "file_digest"): return hashlib.file_digest(f, make_hash).hexdigest()
+        digest = make_hash()
+        if os.fstat(f.fileno()).st_size: # Empty files cannot be mapped
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm: digest.update(mm)
+        return digest.hexdigest()
+
+def fast_sha256(path):
+    """Returns the hex SHA256 of a file."""
+    return _file_digest(path, hashlib.sha256)
+
+def _git_blob_sha1(path):
+    """Returns the git blob SHA1 of a file, which the Hub reports for files not stored in LFS."""
+    header = f"blob {os.path.getsize(path)}\0".encode()
+    return _file_digest(path, lambda: hashlib.sha1(header))
+
+# --- Parallel Range Download ---
+def preallocate(fd, size):
+    """Reserves size bytes for fd in one go, falling back to ftruncate where posix_fallocate is unavailable (Windows, some filesystems)."""
+    try: os.posix_fallocate(fd, 0, size)
+    except (AttributeError, OSError): os.ftruncate(fd, size)
+
+def _write_at(fd, data, offset, lock):
+    """Writes data to fd at offset, using pwrite where available (not on Windows)."""
+    if hasattr(os, "pwrite"):
+        view = memoryview(data)
+        while view:
+            written = os.pwrite(fd, view, offset); view = view[written:]; offset += written
+    else:
+        with lock: os.lseek(fd, offset, os.SEEK_SET); os.write(fd, data)
+
+def _iter_range(url, headers, client):
+    """Yields the body of a ranged GET, through the shared httpx client when one is available."""
+    if client is not None:
+        with client.stream("GET", url, headers=headers) as response:
+            if response.status_code != 206: raise IOError(f"Server ignored range request (HTTP {response.status_code})")
+            yield from response.iter_bytes(DOWNLOAD_CHUNK_SIZE)
+    else:
+        with urllib.request.urlopen(urllib.request.Request(url, headers=headers), timeout=60) as response:
+            if response.status != 206: raise IOError(f"Server ignored range request (HTTP {response.status})")
+            yield from iter(lambda: response.read(DOWNLOAD_CHUNK_SIZE), b"")
+
+def _fetch_range(url, headers, fd, span, lock, stop_events, client=None):
+    """Downloads bytes [span[0], span[1]) of url into fd at the same offsets, advancing span[0] as data lands."""
+    start, end = span
+    if start >= end: return
+    for chunk in _iter_range(url, {**headers, "Range": f"bytes={start}-{end - 1}"}, client):
+        if any(event.is_set() for event in stop_events): raise InterruptedError("Download cancelled during operation")
+        _write_at(fd, chunk, span[0], lock); span[0] += len(chunk)
+    if span[0] != end: raise IOError(f"Connection closed early at byte {span[0]} (range {start}-{end - 1})")
+
+def _load_spans(state_path, tmp_path, size, expected_sha256):
+    """Returns the saved [next_offset, end] spans of an interrupted range download, or None if they don't match."""
+    try:
+        with open(state_path, encoding="utf-8") as f: state = json.load(f)
+        if state["size"] == size and state["sha256"] == expected_sha256 and os.path.getsize(tmp_path) == size: return state["spans"]
+    except (OSError, ValueError, KeyError): pass
+    return None
+
+def parallel_single_download(url, dest, size, n=PARALLEL_DOWNLOAD_CONNECTIONS, headers=None, expected_sha256=None, cancel_event=None, client=None, resume=False):
+    """Downloads url to dest (a str or Path) using n concurrent HTTP Range requests written at their offsets. Returns dest.
+
+    With resume, an interrupted download keeps its .incomplete file plus a .json record of each range's
+    progress, and the next call only fetches the missing bytes.
+    """
+    tmp_path = os.fspath(dest) + ".incomplete"; state_path = tmp_path + ".json"
+    abort_event = threading.Event(); lock = threading.Lock()
+    stop_events = (abort_event, cancel_event) if cancel_event is not None else (abort_event,)
+    spans = _load_spans(state_path, tmp_path, size, expected_sha256) if resume else None
+    fd = os.open(tmp_path, os.O_RDWR | os.O_CREAT | (0 if spans else os.O_TRUNC) | getattr(os, "O_BINARY", 0), 0o644)
+    try:
+        if not spans:
+            preallocate(fd, size)
+            bounds = [size * i // n for i in range(n + 1)]
+            spans = [[a, b] for a, b in zip(bounds, bounds[1:]) if b > a]
+        with ThreadPoolExecutor(max_workers=len(spans)) as pool:
+            futures = [pool.submit(_fetch_range, url, headers or {}, fd, span, lock, stop_events, client) for span in spans]
+            try:
+                for future in as_completed(futures): future.result()
+            except BaseException:
+                abort_event.set(); raise
+    except BaseException:
+        os.close(fd)
+        if resume and spans:
+            try:
+                with open(state_path, "w", encoding="utf-8") as f: json.dump({"size": size, "sha256": expected_sha256, "spans": spans}, f)
+            except OSError: pass
+        else:
+            try: os.remove(tmp_path)
+            except OSError: pass
+        raise
+    os.close(fd)
+    if os.path.exists(state_path): os.remove(state_path)
+    if expected_sha256 and fast_sha256(tmp_path) != expected_sha256:
+        os.remove(tmp_path); raise IOError(f"SHA256 mismatch for {os.path.basename(dest)}; partial file removed")
+    os.replace(tmp_path, dest)
+    return dest
+
+def _parallel_download_plan(repo_id, filename):
+    """Returns (url, size, sha256, headers) for a Hub file, or None if it should use hf_hub_download."""
+    # hf_transfer already splits large files across connections, so skip the metadata round-trip entirely
+    if hf_transfer_enabled(): return None
+    hub_url = hf_hub_url(repo_id=repo_id, filename=filename)
+    meta = get_hf_file_metadata(hub_url)
+    if not meta.size or meta.size <= PARALLEL_DOWNLOAD_THRESHOLD: return None
+    # The resolved location is usually a signed CDN URL, which must not receive the Hub token
+    same_host = urllib.parse.urlparse(meta.location).netloc == urllib.parse.urlparse(hub_url).netloc
+    etag = (meta.etag or "").strip('"').lower()
+    sha256 = etag if re.fullmatch(r"[0-9a-f]{64}", etag) else None
+    return meta.location, meta.size, sha256, build_hf_headers() if same_host else {}
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# The entry points import the shared helpers from the repo root
+sys.path.insert(0, str(Path(__file__).parent.parent))
@@ -64,3 +64,51 @@ def test_ensure_directory_permission_error(tmp_path, mocker):
 
     assert result is False
     assert not target_dir.exists()
+
+@pytest.mark.parametrize("message, expected", [
+    ("404 Client Error: Not Found for url", True),
+    ("Repository Not Found for url: https://huggingface.co/api/models/x", True),
+    ("EntryNotFoundError: entry_not_found", True),
+    ("500 Server Error: Internal Server Error", False),
+])
+def test_not_found_regex(message, expected):
+    """Test the classification of 'not found' errors."""
+    assert bool(cli_hug._NOT_FOUND_RE.search(message)) is expected
+
+def test_handle_download_error_dispatches_on_mro(mocker):
+    """Test that error subclasses reach their base class handler and unknown errors get the fallback."""
+    handler = mocker.Mock()
+    mocker.patch.dict(cli_hug._ERR_HANDLERS, {FileNotFoundError: handler})
+    mock_print = mocker.patch.object(cli_hug.console, "print")
+
+    err = IsADirectoryError("x") # A sibling of FileNotFoundError, not a subclass
+    cli_hug.handle_download_error(err, "org/model")
+    handler.assert_not_called()
+    assert "unexpected" in mock_print.call_args_list[0].args[0]
+
+    class MissingDir(FileNotFoundError): pass
+    err = MissingDir("y")
+    cli_hug.handle_download_error(err, "org/model", "a.bin")
+    handler.assert_called_once_with(err, "org/model", "a.bin")
+
+def test_parse_args_builds_download_spec(tmp_path):
+    """Test that the scripted subcommands map onto a DownloadSpec."""
+    spec = cli_hug.parse_args(["file", "org/model", "config.json", "-d", str(tmp_path), "--no-hf-transfer"])
+    assert spec == cli_hug.DownloadSpec("org/model", tmp_path.resolve(), "config.json", cli_hug.DEFAULT_WORKERS, False, False)
+
+    spec = cli_hug.parse_args(["model", "org/model", "-d", str(tmp_path), "-w", "8", "--info"])
+    assert (spec.filename, spec.workers, spec.use_hf_transfer, spec.fetch_info) == (None, 8, True, True)
+
+@pytest.mark.parametrize("workers", ["0", "-1", "5", "64"])
+def test_parse_args_rejects_unsupported_workers(workers, tmp_path):
+    """Test that --workers only accepts the counts offered in the interactive menu."""
+    with pytest.raises(SystemExit):
+        cli_hug.parse_args(["model", "org/model", "-d", str(tmp_path), "-w", workers])
+
+def test_run_cli_dispatches_without_prompting(tmp_path, mocker):
+    """Test that run_cli never prompts and returns an exit code."""
+    mock_prompt = mocker.patch.object(cli_hug.Prompt, "ask")
+    mock_model = mocker.patch.object(cli_hug, "download_model", return_value=False)
+    assert cli_hug.run_cli(["model", "org/model", "-d", str(tmp_path)]) == 1
+    mock_model.assert_called_once()
+    mock_prompt.assert_not_called()
@@ -0,0 +1,195 @@
+import io
+import hashlib
+import pytest
+import hugger_core
+from types import SimpleNamespace
+
+def test_set_hf_transfer_toggles_env(monkeypatch):
+    """Test that hf_transfer is enabled and disabled through the environment variable."""
+    monkeypatch.setattr(hugger_core, "HF_TRANSFER_AVAILABLE", True)
+    monkeypatch.delenv("HF_HUB_ENABLE_HF_TRANSFER", raising=False)
+
+    assert hugger_core.set_hf_transfer(True) is True
+    assert hugger_core.os.environ["HF_HUB_ENABLE_HF_TRANSFER"] == "1"
+
+    assert hugger_core.set_hf_transfer(False) is False
+    assert "HF_HUB_ENABLE_HF_TRANSFER" not in hugger_core.os.environ
+
+def test_make_http_client_uses_http11_for_ranges():
+    """Test that the default client keeps one HTTP/1.1 connection per range instead of multiplexing over HTTP/2."""
+    pytest.importorskip("httpx")
+    with hugger_core.make_http_client() as client:
+        assert client._transport._pool._http2 is False
+
+def _fake_range_urlopen(payload):
+    """Returns a urlopen replacement that serves HTTP Range requests from payload."""
+    def fake_urlopen(request, timeout=None):
+        start, end = map(int, request.get_header("Range").split("=")[1].split("-"))
+        response = io.BytesIO(payload[start:end + 1])
+        response.status = 206
+        return response
+    return fake_urlopen
+
+def test_parallel_single_download_reassembles_ranges(tmp_path, mocker):
+    """Test that ranged chunks are written at the right offsets and the checksum is verified."""
+    payload = bytes(range(256)) * 4099
+    mocker.patch.object(hugger_core.urllib.request, "urlopen", side_effect=_fake_range_urlopen(payload))
+    dest = tmp_path / "model.bin"
+
+    result = hugger_core.parallel_single_download("https://cdn.example/model.bin", str(dest), len(payload), n=5, expected_sha256=hashlib.sha256(payload).hexdigest())
+
+    assert result == str(dest)
+    assert dest.read_bytes() == payload
+    assert not (tmp_path / "model.bin.incomplete").exists()
+
+def test_parallel_single_download_sha_mismatch(tmp_path, mocker):
+    """Test that a checksum mismatch removes the partial file and raises."""
+    payload = b"weights" * 1000
+    mocker.patch.object(hugger_core.urllib.request, "urlopen", side_effect=_fake_range_urlopen(payload))
+    dest = tmp_path / "model.bin"
+
+    with pytest.raises(IOError, match="SHA256 mismatch"):
+        hugger_core.parallel_single_download("https://cdn.example/model.bin", str(dest), len(payload), n=3, expected_sha256="0" * 64)
+
+    assert not dest.exists()
+    assert not (tmp_path / "model.bin.incomplete").exists()
+
+def test_preallocate_reserves_size(tmp_path):
+    """Test that preallocation sizes the file to the requested length."""
+    target = tmp_path / "weights.bin"
+    fd = hugger_core.os.open(target, hugger_core.os.O_RDWR | hugger_core.os.O_CREAT)
+    try: hugger_core.preallocate(fd, 4096)
+    finally: hugger_core.os.close(fd)
+    assert target.stat().st_size == 4096
+
+def test_parallel_single_download_uses_shared_client(tmp_path):
+    """Test that ranged requests go through the supplied httpx client."""
+    httpx = pytest.importorskip("httpx")
+    payload = bytes(range(256)) * 2053
+    seen_ranges = []
+
+    def handler(request):
+        seen_ranges.append(request.headers["Range"])
+        start, end = map(int, request.headers["Range"].split("=")[1].split("-"))
+        return httpx.Response(206, content=payload[start:end + 1])
+
+    dest = tmp_path / "model.bin"
+    with httpx.Client(transport=httpx.MockTransport(handler)) as client:
+        hugger_core.parallel_single_download("https://cdn.example/model.bin", str(dest), len(payload), n=4, client=client)
+
+    assert dest.read_bytes() == payload
+    assert len(seen_ranges) == 4
+
+def test_parallel_single_download_resumes_missing_ranges(tmp_path, mocker):
+    """Test that a resumed download only requests the ranges that did not finish."""
+    payload = bytes(range(256)) * 64
+    serve_range = _fake_range_urlopen(payload)
+    requested = []
+
+    def failing_urlopen(request, timeout=None):
+        if not request.get_header("Range").startswith("bytes=0-"): raise IOError("connection reset")
+        return serve_range(request)
+
+    def recording_urlopen(request, timeout=None):
+        requested.append(request.get_header("Range"))
+        return serve_range(request)
+
+    dest = tmp_path / "model.bin"
+    mocker.patch.object(hugger_core.urllib.request, "urlopen", side_effect=failing_urlopen)
+    with pytest.raises(IOError, match="connection reset"):
+        hugger_core.parallel_single_download("https://cdn.example/model.bin", str(dest), len(payload), n=2, resume=True)
+    assert (tmp_path / "model.bin.incomplete.json").exists()
+
+    mocker.patch.object(hugger_core.urllib.request, "urlopen", side_effect=recording_urlopen)
+    hugger_core.parallel_single_download("https://cdn.example/model.bin", str(dest), len(payload), n=2, resume=True)
+
+    assert requested == [f"bytes={len(payload) // 2}-{len(payload) - 1}"]
+    assert dest.read_bytes() == payload
+    assert not (tmp_path / "model.bin.incomplete.json").exists()
+
+def test_fast_sha256_matches_hashlib(tmp_path, monkeypatch):
+    """Test that both the file_digest and the mmap code paths produce the standard SHA256."""
+    data_file = tmp_path / "weights.bin"
+    data_file.write_bytes(b"\x01\x02" * 70000)
+    expected = hashlib.sha256(data_file.read_bytes()).hexdigest()
+
+    assert hugger_core.fast_sha256(str(data_file)) == expected
+    monkeypatch.delattr(hugger_core.hashlib, "file_digest", raising=False)
+    assert hugger_core.fast_sha256(str(data_file)) == expected
+
+    empty_file = tmp_path / "empty"
+    empty_file.write_bytes(b"")
+    assert hugger_core.fast_sha256(str(empty_file)) == hashlib.sha256(b"").hexdigest()
+
+def test_set_hf_transfer_unavailable(monkeypatch):
+    """Test that hf_transfer stays disabled when the package is not installed."""
+    monkeypatch.setattr(hugger_core, "HF_TRANSFER_AVAILABLE", False)
+    monkeypatch.delenv("HF_HUB_ENABLE_HF_TRANSFER", raising=False)
+
+    assert hugger_core.set_hf_transfer(True) is False
+    assert "HF_HUB_ENABLE_HF_TRANSFER" not in hugger_core.os.environ
+
+def test_set_xet_high_performance(monkeypatch):
+    """Test that Xet high-performance mode is only enabled when hf_xet is installed, and is fixed by the first call."""
+    monkeypatch.delenv("HF_XET_HIGH_PERFORMANCE", raising=False)
+
+    monkeypatch.setattr(hugger_core, "_XET_HIGH_PERFORMANCE", None)
+    monkeypatch.setattr(hugger_core, "HF_XET_AVAILABLE", True)
+    assert hugger_core.set_xet_high_performance(True) is True
+    assert hugger_core.os.environ["HF_XET_HIGH_PERFORMANCE"] == "1"
+    assert hugger_core.set_xet_high_performance(False) is True # hf_xet keeps its first setting
+
+    monkeypatch.setattr(hugger_core, "_XET_HIGH_PERFORMANCE", None)
+    monkeypatch.setattr(hugger_core, "HF_XET_AVAILABLE", False)
+    assert hugger_core.set_xet_high_performance(True) is False
+    assert "HF_XET_HIGH_PERFORMANCE" not in hugger_core.os.environ
+
+def test_parallel_single_download_accepts_path(tmp_path, mocker):
+    """Test that a Path destination is reassembled in order and returned unchanged."""
+    payload = bytes(range(256)) * 1031
+
+    def fake_urlopen(request, timeout=None):
+        start, end = map(int, request.get_header("Range").split("=")[1].split("-"))
+        response = io.BytesIO(payload[start:end + 1])
+        response.status = 206
+        return response
+
+    mocker.patch.object(hugger_core.urllib.request, "urlopen", side_effect=fake_urlopen)
+    dest = tmp_path / "model.bin"
+
+    result = hugger_core.parallel_single_download("https://cdn.example/model.bin", dest, len(payload), n=4)
+
+    assert result == dest
+    assert dest.read_bytes() == payload
+
+def test_parallel_download_plan_skips_metadata_with_hf_transfer(monkeypatch, mocker):
+    """Test that no HEAD request is made when hf_transfer will handle the download anyway."""
+    monkeypatch.setattr(hugger_core, "HF_TRANSFER_AVAILABLE", True)
+    monkeypatch.setattr(hugger_core.hf_constants, "HF_HUB_ENABLE_HF_TRANSFER", True, raising=False)
+    mock_metadata = mocker.patch.object(hugger_core, "get_hf_file_metadata")
+    assert hugger_core._parallel_download_plan("org/model", "model.safetensors") is None
+    mock_metadata.assert_not_called()
+
+def test_parallel_download_plan_ignores_unsupported_hf_transfer_env(monkeypatch, mocker):
+    """Test that the environment variable alone does not skip the range path when huggingface_hub no longer uses hf_transfer."""
+    monkeypatch.delattr(hugger_core.hf_constants, "HF_HUB_ENABLE_HF_TRANSFER", raising=False)
+    monkeypatch.setenv("HF_HUB_ENABLE_HF_TRANSFER", "1")
+    mocker.patch.object(hugger_core, "hf_hub_url", return_value="https://huggingface.co/org/model/resolve/main/model.safetensors")
+    mock_metadata = mocker.patch.object(hugger_core, "get_hf_file_metadata", return_value=SimpleNamespace(size=1024))
+    assert hugger_core._parallel_download_plan("org/model", "model.safetensors") is None # Below the size threshold
+    mock_metadata.assert_called_once()
+
+def test_cached_model_info_uses_disk_cache(tmp_path, mocker):
+    """Test that model_info is fetched once and then served from the disk cache until the TTL expires."""
+    fake_info = SimpleNamespace(sha="abc123", siblings=[SimpleNamespace(rfilename="config.json", size=42, lfs=None, blob_id="b1")])
+    mock_model_info = mocker.patch.object(hugger_core, "model_info", return_value=fake_info)
+
+    first = hugger_core.cached_model_info("org/model", cache_dir=tmp_path)
+    second = hugger_core.cached_model_info("org/model", cache_dir=tmp_path)
+
+    assert first == second == {"sha": "abc123", "siblings": [{"rfilename": "config.json", "size": 42, "sha256": None, "blob_id": "b1"}]}
+    assert mock_model_info.call_count == 1
+    assert (tmp_path / "org--model.json").exists()
+
+    hugger_core.cached_model_info("org/model", ttl=0, cache_dir=tmp_path)
+    assert mock_model_info.call_count == 2
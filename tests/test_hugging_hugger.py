@@ -1,6 +1,12 @@
+import time
+import queue
+import asyncio
+import threading
+import hashlib
 import pytest
 import importlib.util
 from pathlib import Path
+from types import SimpleNamespace
 
 # Load Hugging Hugger.py module dynamically to bypass the space in the filename
 spec = importlib.util.spec_from_file_location("hugging_hugger", str(Path(__file__).parent.parent / "Hugging Hugger.py"))
@@ -48,3 +54,300 @@ def test_validate_path_traversal(tmp_path):
     # It should resolve correctly to target_dir if target_dir exists
     result = validate_path(traversal_path)
     assert result == target_dir.resolve()
+
+def test_snapshot_async_downloads_all_files(tmp_path, mocker):
+    """Test that the async engine fetches every listed file into the target directory."""
+    aiohttp_web = pytest.importorskip("aiohttp.web")
+    pytest.importorskip("aiofiles")
+    files = {"config.json": b"{}", "sub/weights.bin": b"\x00" * 5000}
+
+    async def handler(request):
+        return aiohttp_web.Response(body=files[request.match_info["name"]])
+
+    progress = [0]
+
+    async def run():
+        app = aiohttp_web.Application(); app.router.add_get("/{name:.+}", handler)
+        runner = aiohttp_web.AppRunner(app); await runner.setup()
+        site = aiohttp_web.TCPSite(runner, "127.0.0.1", 0); await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        mocker.patch.object(hugging_hugger, "hf_hub_url", side_effect=lambda repo_id, filename, revision=None: f"http://127.0.0.1:{port}/{filename}")
+        try: return await hugging_hugger._snapshot_async("org/model", str(tmp_path), 2, {"config.json": None, "sub/weights.bin": 5000}, "main", queue.Queue(), threading.Event(), progress=progress)
+        finally: await runner.cleanup()
+
+    assert asyncio.run(run()) == str(tmp_path)
+    for name, content in files.items():
+        assert (tmp_path / name).read_bytes() == content
+    assert not list(tmp_path.rglob("*.incomplete"))
+    assert progress == [5002] # Bytes received, not the preallocated sizes
+
+def test_waking_queue_signals_pipe():
+    """Test that each put also writes a wakeup byte to the pipe."""
+    read_fd, write_fd = hugging_hugger.os.pipe()
+    try:
+        status_queue = hugging_hugger.WakingQueue(write_fd)
+        status_queue.put("first"); status_queue.put(("PROGRESS_START", "second"))
+        assert hugging_hugger.os.read(read_fd, 16) == b"xx"
+        assert status_queue.get_nowait() == "first"
+    finally:
+        hugging_hugger.os.close(read_fd); hugging_hugger.os.close(write_fd)
+
+def test_process_queue_flushes_logs_in_one_batch(mocker):
+    """Test that all queued log lines are handed to one deferred flush, with only the last result line for the status bar."""
+    MsgKind = hugging_hugger.MsgKind
+    app = SimpleNamespace(status_queue=queue.Queue(), cancel_requested=threading.Event(), download_active=True, _progress_depth=0,
+                          _HANDLERS=hugging_hugger.HuggingFaceDownloaderApp._HANDLERS,
+                          start_progress=mocker.Mock(), _defer_flush=mocker.Mock())
+    app._apply_batch = lambda batch: hugging_hugger.HuggingFaceDownloaderApp._apply_batch(app, batch)
+    for message in [(MsgKind.PROGRESS_START, "Downloading..."), (MsgKind.LOG, "Starting download..."), (MsgKind.ERROR, "ERROR: Retrying"), (MsgKind.SUCCESS, "SUCCESS: Downloaded config.json\nSaved to: /tmp")]:
+        app.status_queue.put(message)
+
+    hugging_hugger.HuggingFaceDownloaderApp._process_queue(app)
+
+    app.start_progress.assert_called_once_with("Downloading...")
+    app._defer_flush.assert_called_once_with(["Starting download...", "ERROR: Retrying", "SUCCESS: Downloaded config.json\nSaved to: /tmp"], "SUCCESS: Downloaded config.json")
+
+def test_needs_download_compares_size_and_hash(tmp_path, mocker):
+    """Test that complete files are skipped and verified hashes are not recomputed."""
+    content = b'{"model_type": "bert"}'
+    local_file = tmp_path / "config.json"
+    blob_id = hashlib.sha1(b"blob %d\0" % len(content) + content).hexdigest()
+    meta = {"size": len(content), "sha256": None, "blob_id": blob_id}
+    verified = {}
+
+    assert hugging_hugger.needs_download(str(local_file), meta, verified) is True
+    local_file.write_bytes(content)
+    assert hugging_hugger.needs_download(str(local_file), meta, verified) is False
+    assert len(verified) == 1
+
+    hash_spy = mocker.spy(hugging_hugger, "_git_blob_sha1")
+    assert hugging_hugger.needs_download(str(local_file), meta, verified) is False
+    hash_spy.assert_not_called()
+
+    assert hugging_hugger.needs_download(str(local_file), {**meta, "size": len(content) + 1}, verified) is True
+    assert hugging_hugger.needs_download(str(local_file), {"size": len(content), "sha256": "0" * 64, "blob_id": None}) is True
+
+def test_download_files_pooled_reports_each_file(mocker):
+    """Test that every sibling is downloaded at the pinned revision and reported on the queue."""
+    mock_download = mocker.patch.object(hugging_hugger, "hf_hub_download", return_value="path")
+    info = {"sha": "abc123", "siblings": [{"rfilename": "config.json"}, {"rfilename": "model.safetensors"}]}
+    status_queue = queue.Queue()
+
+    result = hugging_hugger._download_files_pooled("org/model", "/tmp/org/model", 2, info, status_queue, threading.Event(), True)
+
+    assert result == "/tmp/org/model"
+    assert sorted(call.kwargs["filename"] for call in mock_download.call_args_list) == ["config.json", "model.safetensors"]
+    assert all(call.kwargs["revision"] == "abc123" for call in mock_download.call_args_list)
+    assert status_queue.qsize() == 2
+
+def test_download_files_pooled_cancel_waits_for_files_in_flight(mocker):
+    """Test that a cancel drops queued files but only returns once the file already downloading has finished."""
+    finished = []
+    def slow_download(**kwargs):
+        time.sleep(hugging_hugger.CANCEL_CHECK_INTERVAL * 2); finished.append(kwargs["filename"])
+    mock_download = mocker.patch.object(hugging_hugger, "hf_hub_download", side_effect=slow_download)
+    cancel_event = threading.Event(); cancel_event.set()
+    info = {"sha": "abc", "siblings": [{"rfilename": "big.bin"}, {"rfilename": "queued.bin"}]}
+
+    with pytest.raises(InterruptedError):
+        hugging_hugger._download_files_pooled("org/model", "/tmp/org/model", 1, info, queue.Queue(), cancel_event, True)
+
+    assert finished == ["big.bin"] # No hf-file thread is left writing after the call returns
+    assert mock_download.call_count == 1
+
+def test_ensure_dir_once_skips_repeat_mkdirs(tmp_path, mocker):
+    """Test that a directory is only created once until the cache is reset."""
+    hugging_hugger.reset_dir_cache()
+    (tmp_path / "org").mkdir() # os.makedirs recurses for missing parents, which the spy would count
+    makedirs_spy = mocker.spy(hugging_hugger.os, "makedirs")
+    target = str(tmp_path / "org" / "model")
+
+    hugging_hugger.ensure_dir_once(target); hugging_hugger.ensure_dir_once(target)
+    assert makedirs_spy.call_count == 1
+    assert (tmp_path / "org" / "model").is_dir()
+
+    hugging_hugger.reset_dir_cache(); hugging_hugger.ensure_dir_once(target)
+    assert makedirs_spy.call_count == 2
+
+def test_report_progress_samples_dir_bytes(tmp_path):
+    """Test that the sampler reports the fraction of finished bytes on disk until it is stopped."""
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "a.bin").write_bytes(b"x" * 30); (tmp_path / "sub" / "b.bin").write_bytes(b"y" * 20)
+    (tmp_path / "sub" / "c.bin.incomplete").write_bytes(b"\0" * 100) # Possibly preallocated, so not counted
+    assert hugging_hugger._dir_bytes(str(tmp_path)) == 50
+    assert hugging_hugger._dir_bytes(str(tmp_path / "missing")) == 0
+
+    status_queue, stop_event = queue.Queue(), threading.Event()
+    sampler = threading.Thread(target=hugging_hugger._report_progress, args=(lambda: hugging_hugger._dir_bytes(str(tmp_path)), 40, status_queue, stop_event, 0.01))
+    sampler.start()
+    assert status_queue.get(timeout=2) == (hugging_hugger.MsgKind.PROGRESS, 1.0) # Clamped at 100%
+    stop_event.set(); sampler.join(timeout=2)
+    assert not sampler.is_alive()
+
+def test_check_queue_adapts_poll_interval(mocker):
+    """Test that polling is fast while downloading, medium right after a message and slow when idle."""
+    app = SimpleNamespace(root=mocker.Mock(), download_active=False, _alive=True, _last_msg_tick=0.0, _process_queue=mocker.Mock(return_value=0), check_queue=None)
+    check_queue = hugging_hugger.HuggingFaceDownloaderApp.check_queue
+
+    check_queue(app)
+    assert app.root.after.call_args.args[0] == 500
+    app._process_queue.return_value = 2; check_queue(app)
+    assert app.root.after.call_args.args[0] == 200
+    app.download_active = True; check_queue(app)
+    assert app.root.after.call_args.args[0] == 33
+    app._alive = False; app.root.after.reset_mock(); check_queue(app)
+    app.root.after.assert_not_called() # No rescheduling once the window is closing
+
+def test_pump_queue_hands_batches_to_mainloop(mocker):
+    """Test that the pump thread forwards everything queued as one batch and exits once the mainloop is gone."""
+    MsgKind = hugging_hugger.MsgKind
+    app = SimpleNamespace(status_queue=queue.Queue(), root=mocker.Mock(), _apply_batch=mocker.Mock())
+    app.root.after_idle.side_effect = [None, RuntimeError("main thread is not in main loop")]
+    for message in [(MsgKind.LOG, "a"), (MsgKind.LOG, "b")]: app.status_queue.put(message)
+    threading.Timer(0.05, app.status_queue.put, [(MsgKind.DONE, None)]).start()
+
+    hugging_hugger.HuggingFaceDownloaderApp._pump_queue(app)
+
+    assert app.root.after_idle.call_args_list[0].args == (app._apply_batch, [(MsgKind.LOG, "a"), (MsgKind.LOG, "b")])
+    assert app.root.after_idle.call_args_list[1].args == (app._apply_batch, [(MsgKind.DONE, None)])
+
+def test_apply_batch_skips_progress_animation_for_finished_jobs(mocker):
+    """Test that a start/end pair inside one batch never starts the indeterminate animation."""
+    MsgKind = hugging_hugger.MsgKind
+    app = SimpleNamespace(cancel_requested=threading.Event(), download_active=True, _progress_depth=0,
+                          _HANDLERS=hugging_hugger.HuggingFaceDownloaderApp._HANDLERS, start_progress=mocker.Mock(), stop_progress=mocker.Mock(),
+                          _defer_flush=mocker.Mock(), _end_download_ui_updates=mocker.Mock())
+    batch = [(MsgKind.PROGRESS_START, "Downloading..."), (MsgKind.SUCCESS, "SUCCESS: cached"), (MsgKind.PROGRESS_END, None), (MsgKind.DONE, None)]
+
+    hugging_hugger.HuggingFaceDownloaderApp._apply_batch(app, batch)
+
+    app.start_progress.assert_not_called(); app.stop_progress.assert_not_called()
+    app._end_download_ui_updates.assert_called_once_with("Ready")
+    assert app._progress_depth == 0
+
+def test_defer_flush_coalesces_until_idle(mocker):
+    """Test that log lines from several calls reach the widget in one flush at the next idle."""
+    app = SimpleNamespace(root=mocker.Mock(), _flush_logs=mocker.Mock(), _deferred_logs=[], _deferred_status=None, _flush_scheduled=False)
+    App = hugging_hugger.HuggingFaceDownloaderApp
+    app._flush_deferred = lambda: App._flush_deferred(app)
+
+    App._defer_flush(app, ["a"]); App._defer_flush(app, ["b", "c"], "SUCCESS: done")
+    app.root.after_idle.assert_called_once()
+
+    app.root.after_idle.call_args.args[0]()
+    app._flush_logs.assert_called_once_with(["a", "b", "c"], "SUCCESS: done")
+    assert app._deferred_logs == [] and app._deferred_status is None
+
+def test_run_async_reuses_one_loop_thread():
+    """Test that coroutines from different threads all run on the same background event loop."""
+    async def current_loop(): return asyncio.get_running_loop()
+
+    first = hugging_hugger.run_async(current_loop())
+    results = []
+    worker = threading.Thread(target=lambda: results.append(hugging_hugger.run_async(current_loop())))
+    worker.start(); worker.join(timeout=5)
+    assert results == [first] and first.is_running()
+
+def _hidden_log_app(mocker):
+    App = hugging_hugger.HuggingFaceDownloaderApp
+    app = SimpleNamespace(status_text=mocker.Mock(), update_status_bar=mocker.Mock(), _hidden_log=hugging_hugger.deque(), _hidden_lines=0, _deferred_logs=[])
+    app._flush_logs = lambda messages, status=None, force=False: App._flush_logs(app, messages, status, force)
+    app.status_text.winfo_viewable.return_value = 0; app.status_text.index.return_value = "4.0"
+    return App, app
+
+def test_flush_logs_buffers_while_log_hidden(mocker, monkeypatch):
+    """Test that log lines are held back while the log is not viewable, capped by line count, and written once it is shown."""
+    monkeypatch.setattr(hugging_hugger, "LOG_MAX_LINES", 4)
+    App, app = _hidden_log_app(mocker)
+
+    App._flush_logs(app, ["a", "b"], "Working"); App._flush_logs(app, ["c", "d\ne"])
+    app.status_text.insert.assert_not_called()
+    app.update_status_bar.assert_called_once_with("Working") # The status bar is outside the hidden pane
+    assert list(app._hidden_log) == ["b", "c", "d\ne"] and app._hidden_lines == 4
+
+    app.status_text.winfo_viewable.return_value = 1
+    App._show_hidden_log(app)
+    app.status_text.insert.assert_called_once_with(hugging_hugger.tk.END, "b\nc\nd\ne\n")
+    assert not app._hidden_log and app._hidden_lines == 0
+
+def test_flush_logs_writes_buffered_lines_first_once_viewable(mocker):
+    """Test that the next flush after the log becomes viewable writes buffered lines ahead of new ones, even without a <Map> event."""
+    App, app = _hidden_log_app(mocker)
+    App._flush_logs(app, ["a", "b"])
+
+    app.status_text.winfo_viewable.return_value = 1
+    App._flush_logs(app, ["c"])
+    app.status_text.insert.assert_called_once_with(hugging_hugger.tk.END, "a\nb\nc\n")
+    assert not app._hidden_log and app._hidden_lines == 0
+
+def test_flush_logs_trims_down_to_the_cap(mocker, monkeypatch):
+    """Test that a log past LOG_MAX_LINES is trimmed back to the cap rather than by a fixed number of lines."""
+    monkeypatch.setattr(hugging_hugger, "LOG_MAX_LINES", 4)
+    App, app = _hidden_log_app(mocker)
+    app.status_text.winfo_viewable.return_value = 1; app.status_text.index.return_value = "6.0"
+
+    App._flush_logs(app, ["a", "b"])
+    app.status_text.delete.assert_called_once_with("1.0", "end-4l")
+
+def test_hidden_log_is_cleared_and_synced_before_reads(mocker):
+    """Test that clearing drops buffered lines, and save/copy see buffered and deferred lines even while hidden."""
+    App, app = _hidden_log_app(mocker)
+    App._flush_logs(app, ["old"]); App.clear_status_log(app)
+    assert not app._hidden_log and app._hidden_lines == 0
+
+    App._flush_logs(app, ["hidden"]); app._deferred_logs.append("deferred")
+    App._sync_log(app)
+    app.status_text.insert.assert_called_once_with(hugging_hugger.tk.END, "hidden\ndeferred\n")
+    assert not app._hidden_log and app._deferred_logs == []
+
+def test_discard_partials_keeps_complete_files(tmp_path):
+    """Test that turning resume off only drops hf_hub_download's partial files."""
+    download_dir = tmp_path / ".cache" / "huggingface" / "download" / "sub"
+    download_dir.mkdir(parents=True)
+    (download_dir / "abc.etag.incomplete").write_bytes(b"partial")
+    (download_dir / "weights.bin.metadata").write_text("meta")
+    (tmp_path / "config.json").write_text("{}")
+
+    hugging_hugger._discard_partials(str(tmp_path))
+
+    assert not (download_dir / "abc.etag.incomplete").exists()
+    assert (download_dir / "weights.bin.metadata").exists() and (tmp_path / "config.json").exists()
+    hugging_hugger._discard_partials(str(tmp_path / "missing")) # No download cache yet
+
+@pytest.mark.parametrize("batches", [
+    [[("SUCCESS", "SUCCESS: Downloaded config.json"), ("PROGRESS_END", None), ("DONE", None)]],
+    [[("SUCCESS", "SUCCESS: Downloaded config.json")], [("PROGRESS_END", None), ("DONE", None)]],
+])
+def test_final_status_survives_deferred_result_line(mocker, batches):
+    """Test that a result line still waiting for the idle flush never overwrites the final "Ready" status."""
+    App = hugging_hugger.HuggingFaceDownloaderApp
+    app = SimpleNamespace(cancel_requested=threading.Event(), download_active=True, _progress_depth=1, _HANDLERS=App._HANDLERS,
+                          root=mocker.Mock(), status_bar_label=mocker.Mock(), status_text=mocker.Mock(),
+                          _deferred_logs=[], _deferred_status=None, _flush_scheduled=False, _hidden_log=hugging_hugger.deque(), _hidden_lines=0)
+    for name in ("update_status_bar", "_defer_flush", "_flush_deferred", "_flush_logs"):
+        setattr(app, name, getattr(App, name).__get__(app))
+    app._end_download_ui_updates = lambda status: (setattr(app, "download_active", False), app.update_status_bar(status))
+    app.status_text.winfo_viewable.return_value = 0 # Keeps the text widget out of this test
+
+    for batch in batches: App._apply_batch(app, [(hugging_hugger.MsgKind[kind], payload) for kind, payload in batch])
+    app.root.after_idle.call_args.args[0]() # Run the idle flush
+
+    assert app.status_bar_label.config.call_args.kwargs["text"] == "Ready"
+
+def test_entire_model_verification_stops_on_cancel(tmp_path, mocker):
+    """Test that verifying files already on disk is logged and stops at the next file once cancelled."""
+    info = {"sha": "abc", "siblings": [{"rfilename": f"part{i}.bin", "size": 1, "sha256": None, "blob_id": None} for i in range(3)]}
+    mocker.patch.object(hugging_hugger, "cached_model_info", return_value=info)
+    mocker.patch.object(hugging_hugger, "set_xet_high_performance", return_value=False)
+    mocker.patch.object(hugging_hugger, "hf_transfer_enabled", return_value=False)
+    mocker.patch.object(hugging_hugger, "ASYNC_ENGINE_AVAILABLE", True)
+    cancel_event = threading.Event()
+    mock_needs = mocker.patch.object(hugging_hugger, "needs_download", side_effect=lambda *args: cancel_event.set())
+    status_queue = queue.Queue()
+
+    hugging_hugger.download_entire_model_threaded("org/model", str(tmp_path), 2, status_queue, cancel_event)
+
+    messages = [text for _, text in list(status_queue.queue) if text]
+    assert "Verifying 3 files against the Hub checksums..." in messages
+    assert mock_needs.call_count == 1
+    assert any("acknowledged cancellation" in text for text in messages)